@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     User, Post, Like, Comment, Poll, PollOption, PollVote,
-    Follow, Chat, Message, Notification, Repost, PostInteraction,
+    Follow, Chat, ChatParticipant, Message, Notification, Repost, PostInteraction,
     Mention, Hashtag, PostHashtag, NotificationSettings
 )
 
@@ -54,10 +54,18 @@ class FollowAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
 
 
+class ChatParticipantInline(admin.TabularInline):
+    model = ChatParticipant
+    extra = 0
+    raw_id_fields = ('user',)
+    readonly_fields = ('unread_count',)
+
+
 @admin.register(Chat)
 class ChatAdmin(admin.ModelAdmin):
-    list_display = ('id', 'created_at', 'updated_at')
-    filter_horizontal = ('participants',)
+    list_display = ('id', 'last_message_at', 'created_at', 'updated_at')
+    inlines = [ChatParticipantInline]
+    raw_id_fields = ('last_message',)
 
 
 @admin.register(Message)
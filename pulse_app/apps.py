@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PulseAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pulse_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receivers)
@@ -0,0 +1,107 @@
+"""Per-user Bloom filter of posts the user already reacted to.
+
+Used to drop recommendation candidates in Python instead of excluding the
+user's whole interaction history in SQL. Each user's filter is a Redis
+bitmap of ``settings.PULSE_REACTED_FILTER_BITS`` bits that is replaced every
+``settings.PULSE_REACTED_FILTER_GENERATION`` seconds. A new generation is
+seeded from ``PostInteraction`` restricted to posts that are still live, so
+memory per user stays bounded and expired posts age out of the filter.
+Reactions are added to the current generation as they happen.
+
+False positives only hide a recommendation. There are no false negatives
+while Redis is available.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import PostInteraction
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+REACTED_FILTER_KEY = 'pulse:reacted:{}:{}'
+
+
+def _key(user_id, now=None):
+    generation = int((now or timezone.now()).timestamp()) // settings.PULSE_REACTED_FILTER_GENERATION
+    return REACTED_FILTER_KEY.format(user_id, generation)
+
+
+def _positions(post_id):
+    """Bit offsets of ``post_id``, by double hashing one 128-bit digest"""
+    digest = hashlib.blake2b(str(post_id).encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'big')
+    h2 = int.from_bytes(digest[8:], 'big') | 1
+    bits = settings.PULSE_REACTED_FILTER_BITS
+    return [(h1 + i * h2) % bits for i in range(settings.PULSE_REACTED_FILTER_HASHES)]
+
+
+def _seed(redis, key, user_id, now):
+    """Fill a new generation with the live posts the user reacted to"""
+    post_ids = PostInteraction.objects.filter(
+        user_id=user_id,
+        has_reacted=True,
+        post__expires_at__gt=now
+    ).values_list('post_id', flat=True)
+
+    pipe = redis.pipeline()
+    for post_id in post_ids:
+        for offset in _positions(post_id):
+            pipe.setbit(key, offset, 1)
+    # Bit past the filter: marks the generation as seeded even if it is empty
+    pipe.setbit(key, settings.PULSE_REACTED_FILTER_BITS, 1)
+    pipe.expire(key, 2 * settings.PULSE_REACTED_FILTER_GENERATION)
+    pipe.execute()
+
+
+def add_reacted(user_id, post_id):
+    """Record a reaction in the user's current filter.
+
+    A generation that has not been seeded yet is left alone: seeding reads
+    the reaction from PostInteraction.
+    """
+    key = _key(user_id)
+    try:
+        redis = get_redis()
+        if not redis.exists(key):
+            return
+        pipe = redis.pipeline()
+        for offset in _positions(post_id):
+            pipe.setbit(key, offset, 1)
+        pipe.execute()
+    except RedisError:
+        logger.warning('Could not record reaction of %s in the filter', user_id, exc_info=True)
+
+
+def filter_unreacted(user_id, post_ids, now=None):
+    """Return the ``post_ids`` the user has (probably) not reacted to, keeping their order.
+
+    Returns None if the filter is unavailable, so callers can fall back to
+    the database.
+    """
+    now = now or timezone.now()
+    post_ids = list(post_ids)
+    key = _key(user_id, now)
+    try:
+        redis = get_redis()
+        if not redis.exists(key):
+            _seed(redis, key, user_id, now)
+
+        hashes = settings.PULSE_REACTED_FILTER_HASHES
+        pipe = redis.pipeline()
+        for post_id in post_ids:
+            for offset in _positions(post_id):
+                pipe.getbit(key, offset)
+        bits = pipe.execute()
+    except RedisError:
+        logger.warning('Reacted filter unavailable for %s', user_id, exc_info=True)
+        return None
+
+    return [
+        post_id for i, post_id in enumerate(post_ids)
+        if not all(bits[i * hashes:(i + 1) * hashes])
+    ]
@@ -0,0 +1,81 @@
+"""Sending and delivering direct messages.
+
+Every new message is saved with the next ``seq`` of its chat and pushed to
+the channel-layer group of the chat, where ``consumers.ChatConsumer``
+delivers it to the connected participants. Clients that reconnect ask for
+the messages after the last ``seq`` they saw instead of reloading the
+history.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import Chat, ChatParticipant, Message
+
+logger = logging.getLogger(__name__)
+
+CHAT_GROUP = 'chat.{}'
+# Messages rendered when a chat is opened; older ones are not loaded
+CHAT_HISTORY_SIZE = 50
+# Upper bound of messages replayed to a client resuming from a seq
+RESUME_LIMIT = 200
+
+
+def chat_group(chat_id):
+    return CHAT_GROUP.format(chat_id)
+
+
+def is_participant(chat_id, user):
+    return ChatParticipant.objects.filter(chat_id=chat_id, user=user).exists()
+
+
+def message_payload(message):
+    """JSON-ready representation pushed to clients"""
+    return {
+        'id': str(message.pk),
+        'seq': message.seq,
+        'sender_id': str(message.sender_id),
+        'content_type': message.content_type,
+        'content': message.content,
+        'created_at': timezone.localtime(message.created_at).isoformat(),
+    }
+
+
+def recent_messages(chat, limit=CHAT_HISTORY_SIZE):
+    """The last ``limit`` messages of ``chat``, oldest first"""
+    messages = list(chat.messages.select_related('sender').order_by('-seq')[:limit])
+    messages.reverse()
+    return messages
+
+
+def messages_after(chat_id, after, limit=RESUME_LIMIT):
+    """Payloads of the messages with seq greater than ``after``, oldest first"""
+    messages = Message.objects.filter(chat_id=chat_id, seq__gt=after).order_by('seq')[:limit]
+    return [message_payload(message) for message in messages]
+
+
+def send_message(chat_id, sender, content, content_type='text'):
+    """Save a message and push it to the participants connected to the chat.
+
+    Sending also marks the chat as read for the sender. If the channel layer
+    is unavailable the message is still saved; connected clients pick it up
+    when they resume from their last seq.
+    """
+    message = Message.objects.create(
+        chat_id=chat_id, sender=sender, content=content, content_type=content_type
+    )
+    mark_read(chat_id, sender)
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            chat_group(chat_id), {'type': 'chat.message', 'message': message_payload(message)}
+        )
+    except RedisError:
+        logger.warning('Could not push message %s to chat %s', message.pk, chat_id, exc_info=True)
+    return message
+
+
+def mark_read(chat_id, user):
+    Chat(pk=chat_id).mark_read(user)
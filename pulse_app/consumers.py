@@ -0,0 +1,164 @@
+"""WebSocket consumers"""
+import uuid
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import chats, notifications
+from .live import post_group
+
+# Posts a single connection may follow at once
+MAX_POST_SUBSCRIPTIONS = 100
+
+
+class PostUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live counters and life of the posts a client is viewing.
+
+    The client sends ``{"action": "subscribe" | "unsubscribe", "post_ids": [...]}``
+    and receives ``{"type": "post.update", "post": {...}}`` at most once per
+    post per tick (see ``live.broadcast_updates``), and ``post.removed`` when a
+    post is deleted.
+    """
+
+    async def connect(self):
+        self.post_ids = set()
+        await self.accept()
+
+    async def disconnect(self, code):
+        for post_id in self.post_ids:
+            await self.channel_layer.group_discard(post_group(post_id), self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        post_ids = self._valid_ids(content.get('post_ids'))
+
+        if action == 'subscribe':
+            post_ids = [post_id for post_id in post_ids if post_id not in self.post_ids]
+            post_ids = post_ids[:MAX_POST_SUBSCRIPTIONS - len(self.post_ids)]
+            for post_id in post_ids:
+                await self.channel_layer.group_add(post_group(post_id), self.channel_name)
+            self.post_ids.update(post_ids)
+        elif action == 'unsubscribe':
+            for post_id in post_ids:
+                if post_id in self.post_ids:
+                    await self.channel_layer.group_discard(post_group(post_id), self.channel_name)
+                    self.post_ids.discard(post_id)
+
+    @staticmethod
+    def _valid_ids(post_ids):
+        """Post ids as canonical UUID strings, dropping anything else"""
+        if not isinstance(post_ids, list):
+            return []
+        valid = []
+        for post_id in post_ids:
+            try:
+                valid.append(str(uuid.UUID(str(post_id))))
+            except ValueError:
+                continue
+        return valid
+
+    async def post_update(self, event):
+        await self.send_json({'type': 'post.update', 'post': event['post']})
+
+    async def post_removed(self, event):
+        await self.send_json({'type': 'post.removed', 'post_id': event['post_id']})
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Realtime delivery of the messages of one chat to its participants.
+
+    Connect to ``/ws/chats/<chat_id>/?after=<seq>`` to first receive the
+    messages newer than ``seq`` (resume after a reconnect), then every new
+    message as ``{"type": "chat.message", "message": {...}}``. Clients send
+    ``{"action": "send", "content": "..."}`` and ``{"action": "read"}``.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        self.chat_id = self.scope['url_route']['kwargs']['chat_id']
+        if not self.user.is_authenticated or not await self._is_participant():
+            await self.close()
+            return
+
+        self.group = chats.chat_group(self.chat_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+        after = self._after_seq()
+        if after is not None:
+            for message in await database_sync_to_async(chats.messages_after)(self.chat_id, after):
+                await self.send_json({'type': 'chat.message', 'message': message})
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        if action == 'send':
+            text = (content.get('content') or '').strip()
+            if text:
+                await database_sync_to_async(chats.send_message)(self.chat_id, self.user, text)
+        elif action == 'read':
+            await database_sync_to_async(chats.mark_read)(self.chat_id, self.user)
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'chat.message', 'message': event['message']})
+
+    @database_sync_to_async
+    def _is_participant(self):
+        return chats.is_participant(self.chat_id, self.user)
+
+    def _after_seq(self):
+        for param in self.scope.get('query_string', b'').decode().split('&'):
+            name, _, value = param.partition('=')
+            if name == 'after' and value.isdigit():
+                return int(value)
+        return None
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Stream of the authenticated user's new notifications and unread count.
+
+    Sends ``{"type": "notification.count", "unread_count": n}`` on connect and
+    whenever notifications are marked read, and ``{"type":
+    "notification.new", "notification": {...}, "unread_count": n}`` for each
+    new notification.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group = notifications.user_group(self.user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await self.send_json({'type': 'notification.count', 'unread_count': await self._unread_count()})
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def notification_new(self, event):
+        await self.send_json({
+            'type': 'notification.new',
+            'notification': event['notification'],
+            'unread_count': await self._unread_count(event['unread_count']),
+        })
+
+    async def notification_count(self, event):
+        await self.send_json({
+            'type': 'notification.count',
+            'unread_count': await self._unread_count(event['unread_count']),
+        })
+
+    async def _unread_count(self, count=None):
+        """``count`` from the event, or the cached counter if the event had none"""
+        if count is not None:
+            return count
+        return await database_sync_to_async(notifications.unread_count)(self.user.pk)
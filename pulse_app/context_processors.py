@@ -0,0 +1,9 @@
+from . import notifications
+
+
+def unread_notifications(request):
+    """Contador de notificaciones no leídas para el badge de la barra de navegación (desde caché)"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications_count': notifications.unread_count(user.pk)}
@@ -0,0 +1,272 @@
+"""Atomic interaction counters and life extension for posts.
+
+Every counter change is mirrored in ``Post.engagement_score`` in the same
+UPDATE, so the For You recommender can read its candidates from an index.
+The candidates are then ranked by ``decayed_engagement``, which discounts
+the stored score by the post's age and the share of its life already spent.
+
+With ``settings.PULSE_COUNTER_WRITE_BEHIND`` enabled the deltas are buffered
+in Redis and written to the ``Post`` row in batches by ``flush_pending``
+instead of touching the database on every interaction.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from . import expiry, live
+from .models import Post
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Seconds of life each like adds to a post
+LIKE_LIFE_EXTENSION_SECONDS = 60
+
+# Hash of pending deltas per post and set of posts with pending deltas
+PENDING_KEY = 'pulse:counters:{}'
+DIRTY_KEY = 'pulse:counters:dirty'
+
+# Hash field -> Post counter field
+COUNTER_FIELDS = {
+    'likes': 'likes_count',
+    'comments': 'comments_count',
+    'reposts': 'reposts_count',
+}
+
+
+def _extended_expiry(now, seconds):
+    """expires_at pushed ``seconds`` forward, counting from now if already past"""
+    return Greatest(Coalesce('expires_at', Value(now)), Value(now)) + timedelta(seconds=seconds)
+
+
+def decayed_engagement(engagement_score, created_at, expires_at, now):
+    """Engagement score decayed by age and remaining life.
+
+    Halves every ``settings.PULSE_ENGAGEMENT_HALF_LIFE`` seconds of age and is
+    weighted by the fraction of the post's lifespan still ahead,
+    remaining / (age + remaining), so a post about to expire ranks below a
+    fresh one with the same interactions. Expired posts score 0.
+    """
+    age = max(0.0, (now - created_at).total_seconds())
+    remaining = max(0.0, (expires_at - now).total_seconds()) if expires_at else 0.0
+    if not remaining:
+        return 0.0
+    decay = 0.5 ** (age / settings.PULSE_ENGAGEMENT_HALF_LIFE)
+    return engagement_score * decay * remaining / (age + remaining)
+
+
+def _update(post, fields, **updates):
+    """Apply ``updates`` in a single UPDATE and load the resulting values into ``post``"""
+    Post.objects.filter(pk=post.pk).update(updated_at=timezone.now(), **updates)
+    post.refresh_from_db(fields=fields)
+    live.mark_dirty([post.pk])
+    return post
+
+
+def _decrement(field):
+    return Greatest(F(field) - 1, Value(0))
+
+
+def _decrement_engagement(field):
+    """engagement_score minus one, unless ``field`` is already at 0 and will not go down"""
+    return F('engagement_score') - Least(F(field), Value(1))
+
+
+def _buffer(post, **deltas):
+    """Accumulate ``deltas`` for ``post`` in Redis and merge the pending total into it"""
+    key = PENDING_KEY.format(post.pk)
+    pipe = get_redis().pipeline()
+    for field, amount in deltas.items():
+        pipe.hincrby(key, field, amount)
+    pipe.sadd(DIRTY_KEY, str(post.pk))
+    pipe.hgetall(key)
+    _merge(post, pipe.execute()[-1])
+    live.mark_dirty([post.pk])
+    return post
+
+
+def _merge(post, pending):
+    """Add a hash of pending deltas to the counters and expiry of ``post``"""
+    for field, attname in COUNTER_FIELDS.items():
+        if pending.get(field):
+            setattr(post, attname, max(0, getattr(post, attname) + int(pending[field])))
+    post.engagement_score = sum(getattr(post, attname) for attname in COUNTER_FIELDS.values())
+    life = int(pending.get('life', 0))
+    if life:
+        base = max(post.expires_at or timezone.now(), timezone.now())
+        post.expires_at = base + timedelta(seconds=life)
+        post.total_life_seconds_reached += life
+
+
+def pending_deltas(post_ids):
+    """Buffered deltas of each post in ``post_ids`` that has any, as {post_id: hash}"""
+    post_ids = list(post_ids)
+    if not settings.PULSE_COUNTER_WRITE_BEHIND or not post_ids:
+        return {}
+
+    pipe = get_redis().pipeline()
+    for post_id in post_ids:
+        pipe.hgetall(PENDING_KEY.format(post_id))
+    return {post_id: pending for post_id, pending in zip(post_ids, pipe.execute()) if pending}
+
+
+def apply_pending(posts):
+    """Merge buffered deltas into already loaded posts so reads are up to date"""
+    posts = list(posts)
+    pending = pending_deltas(post.pk for post in posts)
+    for post in posts:
+        if post.pk in pending:
+            _merge(post, pending[post.pk])
+    return posts
+
+
+def pending_post_ids():
+    """Ids of the posts with deltas still waiting to be flushed"""
+    if not settings.PULSE_COUNTER_WRITE_BEHIND:
+        return set()
+    return get_redis().smembers(DIRTY_KEY)
+
+
+def flush_pending(limit=None):
+    """Write buffered deltas to the database, one UPDATE per dirty post.
+
+    Each post's hash is read and deleted in one transaction, so deltas that
+    arrive during the flush land in a fresh hash for the next run. If the
+    UPDATE of a post fails its deltas are added back to its hash and the post
+    is marked dirty again, so they are retried instead of lost.
+    """
+    limit = limit or settings.PULSE_COUNTER_FLUSH_BATCH
+    redis = get_redis()
+    post_ids = redis.spop(DIRTY_KEY, limit)
+    if not post_ids:
+        return {'flushed': 0}
+
+    pipe = redis.pipeline()
+    for post_id in post_ids:
+        key = PENDING_KEY.format(post_id)
+        pipe.hgetall(key)
+        pipe.delete(key)
+    results = pipe.execute()
+
+    now = timezone.now()
+    extended = []
+    failed = {}
+    for post_id, pending in zip(post_ids, results[::2]):
+        if not pending:
+            continue
+        updates = {}
+        for field, attname in COUNTER_FIELDS.items():
+            delta = int(pending.get(field, 0))
+            if delta:
+                updates[attname] = Greatest(F(attname) + delta, Value(0))
+        if updates:
+            # Derived from the new counters so clamping at 0 is reflected too
+            updates['engagement_score'] = sum(
+                updates.get(attname, F(attname)) for attname in COUNTER_FIELDS.values()
+            )
+        life = int(pending.get('life', 0))
+        if life:
+            updates['total_life_seconds_reached'] = F('total_life_seconds_reached') + life
+            updates['expires_at'] = _extended_expiry(now, life)
+        if not updates:
+            continue
+        try:
+            with transaction.atomic():
+                Post.objects.filter(pk=post_id).update(updated_at=now, **updates)
+        except DatabaseError:
+            logger.warning('Could not flush counters of post %s, requeueing', post_id, exc_info=True)
+            failed[post_id] = pending
+            continue
+        if life:
+            extended.append(post_id)
+
+    if failed:
+        _requeue(failed)
+
+    for post_id, expires_at in Post.objects.filter(id__in=extended).values_list('id', 'expires_at'):
+        expiry.schedule_expiry(post_id, expires_at)
+
+    return {'flushed': len(post_ids) - len(failed), 'requeued': len(failed)}
+
+
+def _requeue(failed):
+    """Add the deltas of posts whose flush failed back to their hashes"""
+    pipe = get_redis().pipeline()
+    for post_id, pending in failed.items():
+        key = PENDING_KEY.format(post_id)
+        for field, amount in pending.items():
+            if int(amount):
+                pipe.hincrby(key, field, int(amount))
+        pipe.sadd(DIRTY_KEY, post_id)
+    pipe.execute()
+
+
+def add_like(post):
+    """Count a like and extend the post's life.
+
+    The extension starts from expires_at, or from now if the post is already
+    past it, so concurrent likes never lose seconds.
+    """
+    if settings.PULSE_COUNTER_WRITE_BEHIND:
+        return _buffer(post, likes=1, life=LIKE_LIFE_EXTENSION_SECONDS)
+
+    _update(
+        post,
+        ['likes_count', 'engagement_score', 'total_life_seconds_reached', 'expires_at'],
+        likes_count=F('likes_count') + 1,
+        engagement_score=F('engagement_score') + 1,
+        total_life_seconds_reached=F('total_life_seconds_reached') + LIKE_LIFE_EXTENSION_SECONDS,
+        expires_at=_extended_expiry(timezone.now(), LIKE_LIFE_EXTENSION_SECONDS),
+    )
+    expiry.schedule_expiry(post.pk, post.expires_at)
+    return post
+
+
+def remove_like(post):
+    """Uncount a like. Life already granted is kept."""
+    if settings.PULSE_COUNTER_WRITE_BEHIND:
+        return _buffer(post, likes=-1)
+    return _update(
+        post,
+        ['likes_count', 'engagement_score'],
+        likes_count=_decrement('likes_count'),
+        engagement_score=_decrement_engagement('likes_count'),
+    )
+
+
+def add_comment(post):
+    if settings.PULSE_COUNTER_WRITE_BEHIND:
+        return _buffer(post, comments=1)
+    return _update(
+        post,
+        ['comments_count', 'engagement_score'],
+        comments_count=F('comments_count') + 1,
+        engagement_score=F('engagement_score') + 1,
+    )
+
+
+def add_repost(post):
+    if settings.PULSE_COUNTER_WRITE_BEHIND:
+        return _buffer(post, reposts=1)
+    return _update(
+        post,
+        ['reposts_count', 'engagement_score'],
+        reposts_count=F('reposts_count') + 1,
+        engagement_score=F('engagement_score') + 1,
+    )
+
+
+def remove_repost(post):
+    if settings.PULSE_COUNTER_WRITE_BEHIND:
+        return _buffer(post, reposts=-1)
+    return _update(
+        post,
+        ['reposts_count', 'engagement_score'],
+        reposts_count=_decrement('reposts_count'),
+        engagement_score=_decrement_engagement('reposts_count'),
+    )
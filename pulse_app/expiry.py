@@ -0,0 +1,226 @@
+"""Set-based expiry engine and delayed expiry queue for ephemeral posts"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from . import counters, feed_cache, live, notifications
+from .models import Post, Notification, NotificationSettings
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of post ids scored by the unix timestamp of their expires_at
+EXPIRY_QUEUE_KEY = 'pulse:expiry:queue'
+
+
+def schedule_expiry(post_id, expires_at):
+    """Add or move a post in the expiry queue.
+
+    ZADD overwrites the score, so calling this after a life extension simply
+    pushes the post further down the queue. Failures are logged and left to
+    the periodic sweep.
+    """
+    try:
+        get_redis().zadd(EXPIRY_QUEUE_KEY, {str(post_id): expires_at.timestamp()})
+    except RedisError:
+        logger.warning('Could not schedule expiry for post %s', post_id, exc_info=True)
+
+
+def unschedule_expiry(post_ids):
+    """Remove posts from the expiry queue"""
+    if post_ids:
+        try:
+            get_redis().zrem(EXPIRY_QUEUE_KEY, *[str(post_id) for post_id in post_ids])
+        except RedisError:
+            logger.warning('Could not unschedule expiry for %d posts', len(post_ids), exc_info=True)
+
+
+def pop_due_post_ids(now, limit):
+    """Claim up to ``limit`` post ids whose scheduled expiry is at or before ``now``.
+
+    Each id is removed with its own ZREM so concurrent workers never claim the
+    same post twice.
+    """
+    redis = get_redis()
+    due = redis.zrangebyscore(EXPIRY_QUEUE_KEY, '-inf', now.timestamp(), start=0, num=limit)
+    if not due:
+        return []
+
+    pipe = redis.pipeline()
+    for post_id in due:
+        pipe.zrem(EXPIRY_QUEUE_KEY, post_id)
+    return [post_id for post_id, removed in zip(due, pipe.execute()) if removed]
+
+
+def _expire_chunk(now, chunk_size, post_ids=None):
+    """Expire up to ``chunk_size`` overdue posts and notify their authors.
+
+    Runs in its own short transaction so write locks are only held for one
+    chunk. When ``post_ids`` is given only those posts are considered. Posts
+    with buffered counter deltas are left alone until they are flushed, since
+    a pending like may have extended their life. Returns the number of posts
+    expired.
+    """
+    candidates = Post.objects.select_for_update(skip_locked=True).filter(
+        expires_at__lte=now,
+        is_expired=False
+    )
+    if post_ids is not None:
+        candidates = candidates.filter(id__in=post_ids)
+    # Excluidos antes de cortar el lote, para que no llenen un lote entero
+    # y corten el barrido con posts vencidos detrás
+    pending = counters.pending_post_ids()
+    if pending:
+        candidates = candidates.exclude(id__in=pending)
+
+    with transaction.atomic():
+        rows = list(
+            candidates.order_by('expires_at')
+            .values('id', 'author_id', 'total_life_seconds_reached', 'likes_count')[:chunk_size]
+        )
+        if not rows:
+            return 0
+
+        Post.objects.filter(
+            id__in=[row['id'] for row in rows],
+            is_expired=False
+        ).update(is_expired=True, life_seconds_remaining=0, updated_at=now)
+
+        expired_notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=row['author_id'],
+                notification_type='expire',
+                post_id=row['id'],
+                payload={
+                    'message': 'Tu publicación ha expirado',
+                    'total_life_seconds': row['total_life_seconds_reached'],
+                    'final_likes': row['likes_count'],
+                }
+            )
+            for row in rows
+        ])
+
+        notifications.notifications_created(expired_notifications)
+
+    unschedule_expiry([row['id'] for row in rows])
+    # Los ids se quedan en los timelines de los seguidores hasta la próxima lectura
+    feed_cache.invalidate({row['author_id'] for row in rows})
+    live.mark_dirty(row['id'] for row in rows)
+    return len(rows)
+
+
+def expire_due_posts(now=None, chunk_size=None):
+    """Expire every post whose ``expires_at`` has passed, one chunk at a time.
+
+    Issues O(n / chunk_size) queries instead of one save and one insert per
+    post. Returns a summary dict with the number of posts expired and chunks
+    processed.
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or settings.PULSE_EXPIRY_CHUNK_SIZE
+
+    expired = 0
+    chunks = 0
+    while True:
+        count = _expire_chunk(now, chunk_size)
+        if not count:
+            break
+        expired += count
+        chunks += 1
+        if count < chunk_size:
+            break
+
+    summary = {'expired': expired, 'chunks': chunks, 'chunk_size': chunk_size}
+    logger.info('Expiry pass: %(expired)d posts in %(chunks)d chunks', summary)
+    return summary
+
+
+def expire_scheduled_posts(now=None, limit=None):
+    """Expire the posts whose slot in the expiry queue has come up.
+
+    Work is proportional to the number of posts that actually expired, not to
+    the number of live posts. Claimed posts that were not expired, because
+    their life was extended in the meantime or has deltas still buffered, are
+    put back in the queue with their current expires_at.
+    """
+    now = now or timezone.now()
+    limit = limit or settings.PULSE_EXPIRY_CHUNK_SIZE
+
+    try:
+        post_ids = pop_due_post_ids(now, limit)
+    except RedisError:
+        logger.warning('Expiry queue unavailable, relying on the periodic sweep', exc_info=True)
+        return {'claimed': 0, 'expired': 0, 'rescheduled': 0}
+
+    expired = _expire_chunk(now, limit, post_ids=post_ids) if post_ids else 0
+
+    rescheduled = 0
+    if expired < len(post_ids):
+        for post_id, expires_at in Post.objects.filter(
+            id__in=post_ids,
+            is_expired=False
+        ).values_list('id', 'expires_at'):
+            schedule_expiry(post_id, expires_at)
+            rescheduled += 1
+
+    return {'claimed': len(post_ids), 'expired': expired, 'rescheduled': rescheduled}
+
+
+def warn_expiring_posts(now=None):
+    """Send ``post_expiring`` notifications for posts about to run out of life.
+
+    Only posts expiring within ``settings.PULSE_MAX_EXPIRING_THRESHOLD`` are
+    read, through the (is_expired, expires_at) index. Each author's
+    ``notify_post_expiring`` and ``expiring_threshold`` come from the same
+    query, and ``expiring_notified_for`` records which expires_at was already
+    warned about so a post is warned once per extension.
+    """
+    now = now or timezone.now()
+    max_threshold = settings.PULSE_MAX_EXPIRING_THRESHOLD
+    default_threshold = NotificationSettings._meta.get_field('expiring_threshold').default
+
+    candidates = Post.objects.filter(
+        is_expired=False,
+        expires_at__gt=now,
+        expires_at__lte=now + timedelta(seconds=max_threshold)
+    ).exclude(
+        expiring_notified_for=F('expires_at')
+    ).annotate(
+        wants_warning=Coalesce('author__notification_settings__notify_post_expiring', Value(True)),
+        threshold=Coalesce('author__notification_settings__expiring_threshold', Value(default_threshold)),
+    ).filter(
+        wants_warning=True
+    ).values_list('id', 'author_id', 'expires_at', 'threshold')
+
+    warnings = []
+    warned_posts = []
+    for post_id, author_id, expires_at, threshold in candidates.iterator():
+        threshold = min(threshold, max_threshold)
+        if expires_at - timedelta(seconds=threshold) > now:
+            continue
+        warnings.append(Notification(
+            user_id=author_id,
+            notification_type='post_expiring',
+            post_id=post_id,
+            payload={
+                'message': 'Tu publicación está por expirar',
+                'seconds_remaining': int((expires_at - now).total_seconds()),
+            }
+        ))
+        warned_posts.append(Post(id=post_id, expiring_notified_for=expires_at))
+
+    if warnings:
+        batch_size = settings.PULSE_EXPIRY_CHUNK_SIZE
+        with transaction.atomic():
+            notifications.notifications_created(
+                Notification.objects.bulk_create(warnings, batch_size=batch_size)
+            )
+            Post.objects.bulk_update(warned_posts, ['expiring_notified_for'], batch_size=batch_size)
+
+    return {'warned': len(warnings)}
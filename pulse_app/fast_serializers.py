@@ -0,0 +1,208 @@
+"""Serializer-free representation of hot API reads.
+
+Builds the same dicts as ``PostSerializer`` and ``NotificationSerializer``
+straight from ``values()`` rows, without instantiating models or running the
+DRF field machinery per object. Used by the posts list, feed and trending
+actions and by the notification list when ``settings.PULSE_FAST_API`` is
+enabled. Requests that need nested previews (``?expand=``) keep using the
+serializers.
+
+Any change to the fields of those serializers must be mirrored here.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import counters
+from .models import PollOption, Post, User, VIEWER_STATE_FIELDS
+from .serializers import _query_param_set, _text_preview
+
+AUTHOR_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'bio', 'profile_photo',
+                 'is_private', 'created_at', 'followers_count', 'following_count', 'posts_count')
+ACTOR_FIELDS = ('id', 'username', 'first_name', 'last_name', 'profile_photo')
+POST_FIELDS = ('id', 'post_type', 'content_url', 'text_content', 'created_at', 'expires_at',
+               'is_expired', 'initial_life_seconds', 'likes_count', 'comments_count', 'reposts_count')
+SUMMARY_FIELDS = ('id', 'post_type', 'text_content', 'expires_at',
+                  'likes_count', 'comments_count', 'reposts_count')
+POLL_FIELDS = ('id', 'question', 'created_at')
+NOTIFICATION_FIELDS = ('id', 'notification_type', 'actor_count', 'actor_sample', 'payload', 'is_read', 'created_at')
+
+
+def enabled(request):
+    """Whether ``request`` can be answered by the fast path"""
+    return settings.PULSE_FAST_API and not request.query_params.get('expand')
+
+
+def _datetime(value):
+    """Same output as DRF's DateTimeField: ISO 8601 in the current time zone, 'Z' for UTC"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _file_url(field, name, request):
+    """Same output as DRF's FileField: absolute URL of the stored file, or None"""
+    if not name:
+        return None
+    url = field.storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _prefixed(prefix, fields):
+    return [f'{prefix}__{field}' for field in fields]
+
+
+def _nested(row, prefix, fields):
+    return {field: row[f'{prefix}__{field}'] for field in fields}
+
+
+def _sparse(items, request):
+    """Apply ``?fields=`` like SparseFieldsMixin does for the root serializer"""
+    only = _query_param_set({'request': request}, 'fields')
+    if not only:
+        return items
+    return [{name: value for name, value in item.items() if name in only} for item in items]
+
+
+def post_values(queryset):
+    """``queryset`` of posts (annotated with viewer state) as the rows ``serialize_posts`` expects"""
+    return queryset.prefetch_related(None).values(
+        *POST_FIELDS,
+        *_prefixed('author', AUTHOR_FIELDS),
+        *_prefixed('poll', POLL_FIELDS),
+        *VIEWER_STATE_FIELDS,
+    )
+
+
+def _author(row, request):
+    author = _nested(row, 'author', AUTHOR_FIELDS)
+    author['id'] = str(author['id'])
+    author['profile_photo'] = _file_url(User._meta.get_field('profile_photo'), author['profile_photo'], request)
+    author['created_at'] = _datetime(author['created_at'])
+    return author
+
+
+def _polls(rows):
+    """Options of the polls in ``rows`` in one query, as {poll_id: [option, ...]}"""
+    poll_ids = [row['poll__id'] for row in rows if row['poll__id'] is not None]
+    options = {poll_id: [] for poll_id in poll_ids}
+    if poll_ids:
+        for option in PollOption.objects.filter(poll_id__in=poll_ids).values('poll_id', 'id', 'text', 'votes'):
+            options[option.pop('poll_id')].append({
+                'id': str(option['id']),
+                'text': option['text'],
+                'votes': option['votes'],
+            })
+    return options
+
+
+def _time_remaining(row, now):
+    if row['is_expired'] or not row['expires_at']:
+        return 0
+    return max(0, int((row['expires_at'] - now).total_seconds()))
+
+
+def serialize_posts(rows, request):
+    """Dicts equal to ``PostSerializer(..., many=True).data`` without the expandable fields"""
+    rows = list(rows)
+    polls = _polls(rows)
+    content_url = Post._meta.get_field('content_url')
+    now = timezone.now()
+    items = []
+    for row in rows:
+        remaining = _time_remaining(row, now)
+        poll = None
+        if row['poll__id'] is not None:
+            poll = {
+                'id': str(row['poll__id']),
+                'question': row['poll__question'],
+                'options': polls[row['poll__id']],
+                'created_at': _datetime(row['poll__created_at']),
+            }
+        items.append({
+            'id': str(row['id']),
+            'author': _author(row, request),
+            'post_type': row['post_type'],
+            'content_url': _file_url(content_url, row['content_url'], request),
+            'text_content': row['text_content'],
+            'created_at': _datetime(row['created_at']),
+            'expires_at': _datetime(row['expires_at']),
+            'is_expired': row['is_expired'],
+            'initial_life_seconds': row['initial_life_seconds'],
+            'life_seconds_remaining': remaining,
+            'time_remaining_seconds': remaining,
+            'likes_count': row['likes_count'],
+            'comments_count': row['comments_count'],
+            'reposts_count': row['reposts_count'],
+            'poll': poll,
+            'is_liked': row['is_liked'],
+        })
+    return _sparse(items, request)
+
+
+def notification_values(queryset):
+    """``queryset`` of notifications as the rows ``serialize_notifications`` expects"""
+    return queryset.values(
+        *NOTIFICATION_FIELDS,
+        'actor_id', *_prefixed('actor', ACTOR_FIELDS),
+        'post_id', *_prefixed('post', SUMMARY_FIELDS),
+    )
+
+
+def _apply_pending(summaries):
+    """Merge buffered counter deltas into post summaries, like counters.apply_pending"""
+    pending = counters.pending_deltas({summary['id'] for summary in summaries})
+    for summary in summaries:
+        deltas = pending.get(summary['id'])
+        if not deltas:
+            continue
+        for field, attname in counters.COUNTER_FIELDS.items():
+            if deltas.get(field):
+                summary[attname] = max(0, summary[attname] + int(deltas[field]))
+        life = int(deltas.get('life', 0))
+        if life:
+            summary['expires_at'] = max(summary['expires_at'] or timezone.now(), timezone.now()) + timedelta(seconds=life)
+
+
+def serialize_notifications(rows, request):
+    """Dicts equal to ``NotificationSerializer(..., many=True).data``"""
+    rows = list(rows)
+    summaries = [_nested(row, 'post', SUMMARY_FIELDS) for row in rows if row['post_id'] is not None]
+    _apply_pending(summaries)
+    summaries = iter(summaries)
+    profile_photo = User._meta.get_field('profile_photo')
+
+    items = []
+    for row in rows:
+        actor = post = None
+        if row['actor_id'] is not None:
+            actor = _nested(row, 'actor', ACTOR_FIELDS)
+            actor['id'] = str(actor['id'])
+            actor['profile_photo'] = _file_url(profile_photo, actor['profile_photo'], request)
+        if row['post_id'] is not None:
+            summary = next(summaries)
+            post = {
+                'id': str(summary['id']),
+                'post_type': summary['post_type'],
+                'text_preview': _text_preview(summary['text_content']),
+                'expires_at': _datetime(summary['expires_at']),
+                'likes_count': summary['likes_count'],
+                'comments_count': summary['comments_count'],
+                'reposts_count': summary['reposts_count'],
+            }
+        items.append({
+            'id': str(row['id']),
+            'notification_type': row['notification_type'],
+            'actor': actor,
+            'actor_count': row['actor_count'],
+            'actor_sample': row['actor_sample'],
+            'post': post,
+            'payload': row['payload'],
+            'is_read': row['is_read'],
+            'created_at': _datetime(row['created_at']),
+        })
+    return items
@@ -0,0 +1,52 @@
+"""Short-lived per-viewer cache of feed orderings.
+
+Only the ordered (created_at, id) keys of each feed are cached, for
+``settings.PULSE_FEED_CACHE_TTL`` seconds. Posts are hydrated from the
+database on every read, so likes and remaining life are always current.
+Entries are dropped when the viewer follows or unfollows someone, when an
+account they follow publishes or reposts, and when one of their own posts
+expires or is deleted. Changes that reach a feed by other routes (new
+recommendations, posts from accounts above the fan-out threshold) show up
+once the entry times out.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+FEED_TYPES = ('for_you', 'following')
+FEED_CACHE_KEY = 'pulse:feed:{}:{}'
+
+
+def _key(user_id, feed_type):
+    return FEED_CACHE_KEY.format(user_id, feed_type)
+
+
+def get(user_id, feed_type):
+    """Cached list of (created_at, post_id) keys for a feed, newest first, or None"""
+    try:
+        return cache.get(_key(user_id, feed_type))
+    except RedisError:
+        logger.warning('Feed cache unavailable', exc_info=True)
+        return None
+
+
+def store(user_id, feed_type, keys):
+    try:
+        cache.set(_key(user_id, feed_type), list(keys), settings.PULSE_FEED_CACHE_TTL)
+    except RedisError:
+        logger.warning('Could not cache %s feed of %s', feed_type, user_id, exc_info=True)
+
+
+def invalidate(user_ids):
+    """Drop every cached feed of ``user_ids``"""
+    keys = [_key(user_id, feed_type) for user_id in user_ids for feed_type in FEED_TYPES]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except RedisError:
+        logger.warning('Could not invalidate %d cached feeds', len(user_ids), exc_info=True)
@@ -0,0 +1,49 @@
+"""Feed assembly as a k-way merge of index-ordered post streams.
+
+Each source (own posts, followee posts, followee reposts, recommendations...)
+is a queryset read newest first in small keyset batches, so it is served by
+its own index and only as many rows are read as the merged feed consumes.
+Streams yield (created_at, id) keys and are merged lazily with duplicates
+dropped. Adding a source means adding a queryset, not rewriting a query.
+"""
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+
+# Rows read by the first batch of each stream and upper bound for later ones
+STREAM_BATCH_SIZE = 11
+STREAM_MAX_BATCH_SIZE = 200
+
+
+def stream(queryset, after=None, batch_size=STREAM_BATCH_SIZE):
+    """Yield the (created_at, id) keys of ``queryset``, newest first, strictly older than ``after``.
+
+    Batches double in size up to STREAM_MAX_BATCH_SIZE, so short reads stay
+    cheap and long ones take few queries.
+    """
+    while True:
+        batch = queryset
+        if after is not None:
+            created_at, post_id = after
+            batch = batch.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id))
+        rows = list(batch.order_by('-created_at', '-id').values_list('created_at', 'id')[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]
+        batch_size = min(batch_size * 2, STREAM_MAX_BATCH_SIZE)
+
+
+def merge(*streams):
+    """Merge newest-first key streams into one, dropping duplicate posts"""
+    seen = set()
+    for key in heapq.merge(*streams, reverse=True):
+        if key[1] not in seen:
+            seen.add(key[1])
+            yield key
+
+
+def merged_keys(sources, limit, after=None):
+    """First ``limit`` keys of the merged ``sources`` querysets after the key ``after``"""
+    return list(islice(merge(*(stream(source, after) for source in sources)), limit))
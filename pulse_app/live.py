@@ -0,0 +1,79 @@
+"""Coalesced live updates of post counters and life over WebSockets.
+
+Counter changes, life extensions and expiries only mark the post as dirty in
+a Redis set. Every ``settings.PULSE_LIVE_TICK`` seconds ``broadcast_updates``
+drains the set, reads the current state of those posts in one query and sends
+one message per post to the channel-layer group of its subscribers (see
+``consumers.PostUpdatesConsumer``). However many likes a post gets within a
+tick, each subscriber receives at most one message for it per tick.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .models import Post
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Set of post ids changed since the last broadcast
+LIVE_DIRTY_KEY = 'pulse:live:dirty'
+POST_GROUP = 'post.{}'
+
+
+def post_group(post_id):
+    return POST_GROUP.format(post_id)
+
+
+def mark_dirty(post_ids):
+    """Queue the current state of ``post_ids`` for the next broadcast"""
+    post_ids = [str(post_id) for post_id in post_ids]
+    if not post_ids:
+        return
+    try:
+        get_redis().sadd(LIVE_DIRTY_KEY, *post_ids)
+    except RedisError:
+        logger.warning('Could not queue live updates for %d posts', len(post_ids), exc_info=True)
+
+
+def post_state(post):
+    """Payload pushed to subscribers of ``post``"""
+    return {
+        'id': str(post.pk),
+        'likes_count': post.likes_count,
+        'comments_count': post.comments_count,
+        'reposts_count': post.reposts_count,
+        'expires_at': post.expires_at.isoformat() if post.expires_at else None,
+        'time_remaining_seconds': post.time_remaining_seconds,
+        'is_expired': post.is_expired or post.time_remaining_seconds == 0,
+    }
+
+
+def broadcast_updates(limit=None):
+    """Send the state of every dirty post to its subscribers, once per post"""
+    from . import counters
+
+    limit = limit or settings.PULSE_LIVE_BATCH
+    post_ids = get_redis().spop(LIVE_DIRTY_KEY, limit)
+    if not post_ids:
+        return {'sent': 0}
+
+    posts = counters.apply_pending(Post.objects.filter(id__in=post_ids).only(
+        'id', 'likes_count', 'comments_count', 'reposts_count', 'engagement_score',
+        'expires_at', 'is_expired', 'total_life_seconds_reached'
+    ))
+    channel_layer = get_channel_layer()
+    group_send = async_to_sync(channel_layer.group_send)
+
+    found = set()
+    for post in posts:
+        found.add(str(post.pk))
+        group_send(post_group(post.pk), {'type': 'post.update', 'post': post_state(post)})
+    # Deleted posts: tell subscribers to drop them
+    for post_id in set(post_ids) - found:
+        group_send(post_group(post_id), {'type': 'post.removed', 'post_id': post_id})
+
+    return {'sent': len(post_ids)}
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from pulse_app.models import Follow, Post, User
+
+
+def _count_of(queryset, field):
+    """Rows of ``queryset`` whose ``field`` points at the outer user, as a subquery"""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def expected_counters():
+    """Expressions computing each User counter from the Follow and Post tables"""
+    accepted = Follow.objects.filter(status='accepted')
+    return {
+        'followers_count': _count_of(accepted, 'followee'),
+        'following_count': _count_of(accepted, 'follower'),
+        'posts_count': _count_of(Post.objects.all(), 'author'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Recalcula followers_count, following_count y posts_count de los usuarios desajustados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa, no corrige')
+
+    def handle(self, *args, **options):
+        expected = expected_counters()
+        drifted_ids = list(User.objects.annotate(
+            **{f'expected_{field}': value for field, value in expected.items()}
+        ).exclude(
+            **{field: F(f'expected_{field}') for field in expected}
+        ).values_list('pk', flat=True))
+
+        if not options['dry_run']:
+            batch_size = options['batch_size']
+            for start in range(0, len(drifted_ids), batch_size):
+                User.objects.filter(pk__in=drifted_ids[start:start + batch_size]).update(**expected)
+
+        action = 'desajustados' if options['dry_run'] else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted_ids)} usuarios {action}'))
@@ -0,0 +1,29 @@
+"""Operational counters kept in Redis"""
+import logging
+
+from redis.exceptions import RedisError
+
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'pulse:metrics'
+
+
+def incr(name, amount=1):
+    """Add ``amount`` to the metric ``name``. Failures are logged and ignored."""
+    if not amount:
+        return
+    try:
+        get_redis().hincrby(METRICS_KEY, name, int(amount))
+    except RedisError:
+        logger.debug('Could not record metric %s', name, exc_info=True)
+
+
+def snapshot():
+    """Return every metric as a {name: value} dict"""
+    try:
+        return {name: int(value) for name, value in get_redis().hgetall(METRICS_KEY).items()}
+    except RedisError:
+        logger.warning('Could not read metrics', exc_info=True)
+        return {}
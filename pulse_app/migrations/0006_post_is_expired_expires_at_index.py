@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0005_hashtag_mention_notificationsettings_posthashtag_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_expired', 'expires_at'], name='pulse_app_p_is_expi_39cbc1_idx'),
+        ),
+    ]
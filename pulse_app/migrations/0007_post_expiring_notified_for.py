@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0006_post_is_expired_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='expiring_notified_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
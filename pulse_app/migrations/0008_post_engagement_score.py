@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_engagement_score(apps, schema_editor):
+    Post = apps.get_model('pulse_app', 'Post')
+    Post.objects.update(engagement_score=F('likes_count') + F('comments_count') + F('reposts_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0007_post_expiring_notified_for'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='engagement_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_engagement_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-engagement_score', 'expires_at'], name='pulse_app_p_engagem_4710a0_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_counters(apps, schema_editor):
+    User = apps.get_model('pulse_app', 'User')
+    Follow = apps.get_model('pulse_app', 'Follow')
+    Post = apps.get_model('pulse_app', 'Post')
+
+    def count_of(queryset, field):
+        return Coalesce(Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk')).values('total')
+        ), 0)
+
+    accepted = Follow.objects.filter(status='accepted')
+    User.objects.update(
+        followers_count=count_of(accepted, 'followee'),
+        following_count=count_of(accepted, 'follower'),
+        posts_count=count_of(Post.objects.all(), 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0008_post_engagement_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_user_counters, migrations.RunPython.noop),
+    ]
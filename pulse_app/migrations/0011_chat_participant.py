@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_chat_state(apps, schema_editor):
+    Chat = apps.get_model('pulse_app', 'Chat')
+    ChatParticipant = apps.get_model('pulse_app', 'ChatParticipant')
+    Message = apps.get_model('pulse_app', 'Message')
+
+    latest = Message.objects.filter(chat=OuterRef('pk')).order_by('-created_at')
+    Chat.objects.update(
+        last_message=Subquery(latest.values('pk')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+
+    unread = Message.objects.filter(
+        ~Q(sender=OuterRef('user')),
+        chat=OuterRef('chat'),
+        is_read=False
+    ).order_by().values('chat').annotate(total=Count('pk')).values('total')
+    ChatParticipant.objects.update(unread_count=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0010_notification_user_created_index'),
+    ]
+
+    operations = [
+        # El modelo intermedio adopta la tabla existente de Chat.participants
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ChatParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='pulse_app.chat')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_memberships', to='pulse_app.user')),
+                    ],
+                    options={
+                        'db_table': 'pulse_app_chat_participants',
+                        'unique_together': {('chat', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='chat',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='chats', through='pulse_app.ChatParticipant', to='pulse_app.user'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pulse_app.message'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_chat_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+def backfill_message_seq(apps, schema_editor):
+    Chat = apps.get_model('pulse_app', 'Chat')
+    Message = apps.get_model('pulse_app', 'Message')
+
+    last_seq = {}
+    batch = []
+    for message in Message.objects.order_by('chat_id', 'created_at', 'id').only('id', 'chat_id').iterator():
+        last_seq[message.chat_id] = message.seq = last_seq.get(message.chat_id, 0) + 1
+        batch.append(message)
+        if len(batch) >= 1000:
+            Message.objects.bulk_update(batch, ['seq'])
+            batch = []
+    Message.objects.bulk_update(batch, ['seq'])
+
+    for chat_id, seq in last_seq.items():
+        Chat.objects.filter(pk=chat_id).update(last_seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0011_chat_participant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_message_seq, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('chat', 'seq'), name='unique_message_seq_per_chat'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:06
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def backfill_window_started_at(apps, schema_editor):
+    Notification = apps.get_model('pulse_app', 'Notification')
+    Notification.objects.update(window_started_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pulse_app', '0013_notification_aggregation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='window_started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_window_started_at, migrations.RunPython.noop),
+    ]
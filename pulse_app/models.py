@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 import uuid
 from datetime import timedelta
@@ -18,6 +18,11 @@ class User(AbstractUser):
     gender = models.CharField(max_length=50, blank=True, null=True)
     pronouns = models.CharField(max_length=50, blank=True, null=True)
     
+    # Contadores desnormalizados, mantenidos con UPDATE atómicos (ver signals.py)
+    followers_count = models.PositiveIntegerField(default=0)  # Seguidores aceptados
+    following_count = models.PositiveIntegerField(default=0)  # Seguidos aceptados
+    posts_count = models.PositiveIntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -36,12 +41,23 @@ class User(AbstractUser):
         related_name="pulse_user_permissions",
     )
 
+    COUNTER_FIELDS = ('followers_count', 'following_count', 'posts_count')
+
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return f"@{self.username}"
 
+    def save(self, *args, **kwargs):
+        # Un save() completo de un usuario cargado antes no debe pisar los contadores
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     """Model for follow relationships"""
@@ -63,6 +79,43 @@ class Follow(models.Model):
     def __str__(self):
         return f"{self.follower.username} -> {self.followee.username}"
 
+    def accept(self):
+        """Accept a pending follow request and update both users' counters"""
+        from .signals import change_follow_counts
+
+        with transaction.atomic():
+            accepted = Follow.objects.filter(pk=self.pk, status='pending').update(status='accepted')
+            if accepted:
+                change_follow_counts(self.follower_id, self.followee_id, 1)
+        self.status = 'accepted'
+        return bool(accepted)
+
+
+VIEWER_STATE_FIELDS = ('is_liked', 'is_reposted', 'has_voted', 'is_following_author')
+
+
+class PostQuerySet(models.QuerySet):
+    def with_viewer_state(self, user):
+        """Annotate whether ``user`` liked, reposted, voted on and follows the author of each post.
+
+        Each flag is an EXISTS subquery, so a page costs the same number of
+        queries whatever its size. Anonymous users get constant False.
+        """
+        if not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(**{field: false for field in VIEWER_STATE_FIELDS})
+
+        return self.annotate(
+            is_liked=models.Exists(Like.objects.filter(post=models.OuterRef('pk'), user=user)),
+            is_reposted=models.Exists(Repost.objects.filter(original_post=models.OuterRef('pk'), user=user)),
+            has_voted=models.Exists(PollVote.objects.filter(poll__post=models.OuterRef('pk'), user=user)),
+            is_following_author=models.Exists(Follow.objects.filter(
+                follower=user,
+                followee=models.OuterRef('author_id'),
+                status='accepted'
+            )),
+        )
+
 
 class Post(models.Model):
     """Model for posts (ephemeral content)"""
@@ -86,11 +139,13 @@ class Post(models.Model):
     total_life_seconds_reached = models.IntegerField(default=0)  # For metrics
     is_expired = models.BooleanField(default=False)
     expires_at = models.DateTimeField(null=True, blank=True)
+    expiring_notified_for = models.DateTimeField(null=True, blank=True)  # expires_at already warned about
     
     # Interactions
     likes_count = models.IntegerField(default=0)
     comments_count = models.IntegerField(default=0)
     reposts_count = models.IntegerField(default=0)
+    engagement_score = models.IntegerField(default=0)  # likes + comments + reposts, for recommendations
     
     # Post settings
     is_pinned = models.BooleanField(default=False)
@@ -98,11 +153,15 @@ class Post(models.Model):
     
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['-created_at', 'is_expired']),
+            models.Index(fields=['is_expired', 'expires_at']),
+            models.Index(fields=['-engagement_score', 'expires_at']),
         ]
 
     def __str__(self):
@@ -113,6 +172,18 @@ class Post(models.Model):
             self.expires_at = timezone.now() + timedelta(seconds=self.initial_life_seconds)
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        if not self.is_expired and (update_fields is None or 'expires_at' in update_fields):
+            from .expiry import schedule_expiry
+            schedule_expiry(self.pk, self.expires_at)
+
+    @property
+    def time_remaining_seconds(self):
+        """Seconds of life left, derived from expires_at on every read"""
+        if self.is_expired or not self.expires_at:
+            return 0
+        return max(0, int((self.expires_at - timezone.now()).total_seconds()))
+
 
 class Like(models.Model):
     """Model for likes on posts"""
@@ -195,22 +266,70 @@ class PollVote(models.Model):
         return f"{self.user.username} voted on {self.poll.id}"
 
 
+class ChatQuerySet(models.QuerySet):
+    def with_unread_count(self, user):
+        """Annotate ``unread_count``: messages in each chat that ``user`` has not read yet"""
+        return self.annotate(unread_count=models.Subquery(
+            ChatParticipant.objects.filter(
+                chat=models.OuterRef('pk'),
+                user=user
+            ).values('unread_count')[:1]
+        ))
+
+
 class Chat(models.Model):
-    """Model for direct message conversations"""
+    """Model for direct message conversations.
+
+    ``last_message`` and ``last_message_at`` are maintained when messages
+    are created (see signals), so the inbox does not read the messages
+    table.
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    participants = models.ManyToManyField(User, related_name='chats')
+    participants = models.ManyToManyField(User, related_name='chats', through='ChatParticipant')
+    last_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_seq = models.PositiveIntegerField(default=0)  # seq of the newest message
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ChatQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
 
     def __str__(self):
         return f"Chat {self.id}"
 
+    def mark_read(self, user):
+        """Mark every message from the other participants as read for ``user``"""
+        with transaction.atomic():
+            self.messages.filter(is_read=False).exclude(sender=user).update(is_read=True)
+            ChatParticipant.objects.filter(chat=self, user=user).update(unread_count=0)
+
+
+class ChatParticipant(models.Model):
+    """Membership of a user in a chat, with the user's unread message count"""
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_memberships')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Reutiliza la tabla de la antigua relación ManyToMany implícita
+        db_table = 'pulse_app_chat_participants'
+        unique_together = ['chat', 'user']
+
+    def __str__(self):
+        return f"{self.user.username} in chat {self.chat_id}"
+
 
 class Message(models.Model):
-    """Model for direct messages"""
+    """Model for direct messages.
+
+    ``seq`` numbers the messages of a chat 1, 2, 3... in the order they were
+    saved, so clients can ask for everything after the last one they saw.
+    """
     CONTENT_TYPE_CHOICES = [
         ('text', 'Text'),
         ('post_share', 'Post Share'),
@@ -223,6 +342,7 @@ class Message(models.Model):
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPE_CHOICES, default='text')
     content = models.TextField()
     is_read = models.BooleanField(default=False)
+    seq = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -230,10 +350,24 @@ class Message(models.Model):
         indexes = [
             models.Index(fields=['chat', '-created_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['chat', 'seq'], name='unique_message_seq_per_chat'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} in chat {self.chat.id}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.seq:
+            # The UPDATE locks the chat row until commit, so concurrent
+            # senders get consecutive numbers
+            with transaction.atomic():
+                Chat.objects.filter(pk=self.chat_id).update(last_seq=models.F('last_seq') + 1)
+                self.seq = Chat.objects.values_list('last_seq', flat=True).get(pk=self.chat_id)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
 
 class Notification(models.Model):
     """Model for notifications"""
@@ -256,14 +390,21 @@ class Notification(models.Model):
     post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True)
     comment = models.ForeignKey('Comment', on_delete=models.SET_NULL, null=True, blank=True)
     payload = models.JSONField(default=dict)
+    # Agregación: actores del grupo (user, tipo, post) y muestra de los más recientes
+    actor_count = models.PositiveIntegerField(default=1)
+    actor_sample = models.JSONField(default=list, blank=True)
     is_read = models.BooleanField(default=False)
+    # En notificaciones agregadas, momento del último evento del grupo
     created_at = models.DateTimeField(auto_now_add=True)
+    # Primer evento del grupo: la ventana de agregación se cuenta desde aquí
+    window_started_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
             models.Index(fields=['user', 'notification_type', '-created_at']),
+            models.Index(fields=['user', '-created_at']),
         ]
 
     def __str__(self):
@@ -372,7 +513,7 @@ class NotificationSettings(models.Model):
     notify_friend_reminder = models.BooleanField(default=False)
     
     # Time before expiry to notify (in seconds)
-    expiring_threshold = models.IntegerField(default=60)  # 1 minute
+    expiring_threshold = models.IntegerField(default=60)  # Seconds before expiry (1 minute)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,238 @@
+"""Cached unread notification counters and the live notification stream.
+
+Each user's unread count lives in the Django cache for
+``settings.PULSE_UNREAD_CACHE_TTL`` seconds. It is counted from the database
+only on a miss, incremented when notifications are created (single rows via
+the post_save signal, bulk inserts by their callers) and reset or
+decremented when notifications are marked read. Increments on a missing key
+are skipped, since the next read counts them anyway. When the cache is not
+shared between processes (``REDIS_URL=memory://``) the counter is deleted
+instead of adjusted, since a worker could only update its own copy.
+
+New notifications and count changes are pushed once the transaction
+commits to the channel-layer group of the user, which
+``consumers.NotificationConsumer`` relays to the user's open pages.
+
+With ``settings.PULSE_NOTIFICATION_AGGREGATION`` enabled, ``notify`` folds
+likes, reposts and follows into the latest notification of the same
+(user, type, post) while its first event (``window_started_at``) is within
+``settings.PULSE_NOTIFICATION_WINDOW`` seconds: the row is updated in place
+with the new actor, ``actor_count`` and a bounded ``actor_sample`` instead of
+inserting one row per event. Later events start a new group.
+
+``actor_count`` counts distinct actors. Every actor of an open group is kept
+in a Redis set that expires with the window, so an actor that drops out of
+the sample and acts again is not counted twice. If the set is unavailable
+(Redis down, or the group predates it) only the sample is checked and the
+count may include repeats.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import Notification
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+UNREAD_KEY = 'pulse:notifications:unread:{}'
+NOTIFICATION_GROUP = 'notifications.{}'
+GROUP_ACTORS_KEY = 'pulse:notifications:actors:{}'
+
+# Tipos que se agrupan por (user, notification_type, post)
+AGGREGATED_TYPES = ('like', 'repost', 'follow')
+
+
+def _key(user_id):
+    return UNREAD_KEY.format(user_id)
+
+
+def user_group(user_id):
+    return NOTIFICATION_GROUP.format(user_id)
+
+
+def unread_count(user_id):
+    """Unread notifications of a user, from the cache when possible"""
+    try:
+        count = cache.get(_key(user_id))
+    except RedisError:
+        logger.warning('Unread counter unavailable for %s', user_id, exc_info=True)
+        count = None
+    if count is not None:
+        return count
+
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    try:
+        cache.set(_key(user_id), count, settings.PULSE_UNREAD_CACHE_TTL)
+    except RedisError:
+        logger.warning('Could not cache unread counter of %s', user_id, exc_info=True)
+    return count
+
+
+def _incr(user_id, delta):
+    """Add ``delta`` to a cached counter. Returns the new value, or None if it was not cached"""
+    if settings.PULSE_REDIS_IN_MEMORY:
+        # Caché local del proceso: se recuenta en la próxima lectura
+        cache.delete(_key(user_id))
+        return None
+    try:
+        count = cache.incr(_key(user_id), delta)
+    except ValueError:
+        return None
+    except RedisError:
+        logger.warning('Could not update unread counter of %s', user_id, exc_info=True)
+        return None
+    if count < 0:
+        # Drifted below zero: count again on the next read
+        cache.delete(_key(user_id))
+        return None
+    return count
+
+
+def _send(user_id, event):
+    try:
+        async_to_sync(get_channel_layer().group_send)(user_group(user_id), event)
+    except RedisError:
+        logger.warning('Could not push notification event to %s', user_id, exc_info=True)
+
+
+def payload(notification):
+    """Compact JSON-ready notification pushed to clients"""
+    return {
+        'id': str(notification.pk),
+        'notification_type': notification.notification_type,
+        'actor_id': str(notification.actor_id) if notification.actor_id else None,
+        'post_id': str(notification.post_id) if notification.post_id else None,
+        'actor_count': notification.actor_count,
+        'created_at': timezone.localtime(notification.created_at).isoformat(),
+    }
+
+
+def notifications_created(notifications):
+    """Count and push newly inserted unread notifications (call after bulk_create too)"""
+    notifications = [notification for notification in notifications if not notification.is_read]
+    if not notifications:
+        return
+    per_user = Counter(notification.user_id for notification in notifications)
+
+    def push():
+        counts = {user_id: _incr(user_id, delta) for user_id, delta in per_user.items()}
+        for notification in notifications:
+            _send(notification.user_id, {
+                'type': 'notification.new',
+                'notification': payload(notification),
+                'unread_count': counts[notification.user_id],
+            })
+
+    transaction.on_commit(push)
+
+
+def notify(user, notification_type, actor=None, post=None, **fields):
+    """Create a notification, or fold it into the open group of (user, type, post)"""
+    aggregate = (
+        settings.PULSE_NOTIFICATION_AGGREGATION
+        and notification_type in AGGREGATED_TYPES
+        and actor is not None
+    )
+    if aggregate:
+        notification = _aggregate(user, notification_type, actor, post)
+        if notification is not None:
+            return notification
+        fields['actor_sample'] = [str(actor.pk)]
+    notification = Notification.objects.create(
+        user=user,
+        notification_type=notification_type,
+        actor=actor,
+        post=post,
+        **fields
+    )
+    if aggregate:
+        _add_actor(notification, str(actor.pk))
+    return notification
+
+
+def _add_actor(notification, actor_id):
+    """Add ``actor_id`` to the actor set of a group.
+
+    Returns False if the actor was already in it, True if not, and None if
+    the set is unavailable.
+    """
+    key = GROUP_ACTORS_KEY.format(notification.pk)
+    window_end = notification.window_started_at + timedelta(seconds=settings.PULSE_NOTIFICATION_WINDOW)
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.sadd(key, actor_id)
+            pipe.expire(key, max(1, int((window_end - timezone.now()).total_seconds()) + 1))
+            added, _ = pipe.execute()
+    except RedisError:
+        logger.warning('Actor set of notification %s unavailable', notification.pk, exc_info=True)
+        return None
+    return bool(added)
+
+
+def _aggregate(user, notification_type, actor, post):
+    """Add ``actor`` to the latest group within the window. Returns None if there is none"""
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.PULSE_NOTIFICATION_WINDOW)
+    with transaction.atomic():
+        notification = Notification.objects.select_for_update().filter(
+            user=user,
+            notification_type=notification_type,
+            post=post,
+            window_started_at__gte=since
+        ).order_by('-created_at').first()
+        if notification is None:
+            return None
+
+        sample = notification.actor_sample
+        if not sample and notification.actor_id:
+            # Filas anteriores a la agregación
+            sample = [str(notification.actor_id)]
+        actor_id = str(actor.pk)
+        if actor_id in sample or _add_actor(notification, actor_id) is False:
+            # Mismo actor otra vez (p. ej. like, unlike y like): no se cuenta dos veces
+            return notification
+
+        was_read = notification.is_read
+        notification.actor = actor
+        notification.actor_count = F('actor_count') + 1
+        notification.actor_sample = [actor_id, *sample][:settings.PULSE_NOTIFICATION_ACTOR_SAMPLE]
+        notification.is_read = False
+        notification.created_at = now
+        notification.save(update_fields=['actor', 'actor_count', 'actor_sample', 'is_read', 'created_at'])
+        notification.refresh_from_db(fields=['actor_count'])
+
+    if was_read:
+        # Vuelve a estar sin leer: cuenta como nueva
+        notifications_created([notification])
+    else:
+        transaction.on_commit(lambda: _send(notification.user_id, {
+            'type': 'notification.new',
+            'notification': payload(notification),
+            'unread_count': None,
+        }))
+    return notification
+
+
+def marked_read(user_id, count=1):
+    """Update the counter after ``count`` notifications of a user were marked read"""
+    if count:
+        _send(user_id, {'type': 'notification.count', 'unread_count': _incr(user_id, -count)})
+
+
+def reset_unread(user_id):
+    """All notifications of a user were marked read"""
+    try:
+        cache.set(_key(user_id), 0, settings.PULSE_UNREAD_CACHE_TTL)
+    except RedisError:
+        logger.warning('Could not reset unread counter of %s', user_id, exc_info=True)
+    _send(user_id, {'type': 'notification.count', 'unread_count': 0})
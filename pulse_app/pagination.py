@@ -0,0 +1,69 @@
+"""Keyset pagination for post feeds.
+
+Pages are keyed on (created_at, id) instead of an offset, so every page
+costs one indexed range read of ``page_size + 1`` rows and no COUNT(*),
+however deep the reader has scrolled. The cursor handed to the client is
+opaque.
+"""
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+
+FEED_PAGE_SIZE = 10
+
+
+class FeedPage:
+    """One page of posts and the cursor of the next page (None on the last page)"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(created_at, post_id):
+    raw = f'{created_at.isoformat()}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) key of a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, post_id = raw.split('|')
+        return datetime.fromisoformat(created_at), uuid.UUID(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def paginate_feed(posts, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Return the FeedPage of the ``posts`` queryset that follows ``cursor``, newest first"""
+    key = decode_cursor(cursor)
+    if key is not None:
+        created_at, post_id = key
+        posts = posts.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id))
+    rows = list(posts.order_by('-created_at', '-id')[:page_size + 1])
+
+    items = rows[:page_size]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].pk) if len(rows) > page_size else None
+    return FeedPage(items, next_cursor)
+
+
+def paginate_keys(keys, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Same as paginate_feed for an already ordered, newest-first list of (created_at, id) keys"""
+    key = decode_cursor(cursor)
+    if key is not None:
+        keys = [entry for entry in keys if entry < key]
+    rows = keys[:page_size + 1]
+
+    items = rows[:page_size]
+    next_cursor = encode_cursor(*items[-1]) if len(rows) > page_size else None
+    return FeedPage(items, next_cursor)
@@ -0,0 +1,287 @@
+"""Shared Redis client with an in-process stand-in for tests and local development"""
+import threading
+import time
+
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """Return the shared Redis client.
+
+    Connects to ``settings.PULSE_REDIS_URL``, which defaults to the Celery
+    broker so the web server and the workers share queues and counters. The
+    in-process :class:`InMemoryRedis` is only used when it is explicitly set
+    to ``memory://``. Responses are always decoded to ``str``.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if settings.PULSE_REDIS_IN_MEMORY:
+                    _client = InMemoryRedis()
+                else:
+                    import redis
+                    _client = redis.Redis.from_url(settings.PULSE_REDIS_URL, decode_responses=True)
+    return _client
+
+
+def _parse_bound(value):
+    """Parse a sorted set score bound ('-inf', '+inf', '(1.5', 3) into (score, exclusive)"""
+    if isinstance(value, str):
+        exclusive = value.startswith('(')
+        return float(value.lstrip('(')), exclusive
+    return float(value), False
+
+
+def _in_range(score, low, high):
+    (low, low_excl), (high, high_excl) = low, high
+    if score < low or (low_excl and score == low):
+        return False
+    if score > high or (high_excl and score == high):
+        return False
+    return True
+
+
+class InMemoryRedis:
+    """Minimal, thread-safe stand-in for the subset of redis-py used by Pulse.
+
+    State lives in the current process only, so it is meant for tests and
+    single-process development servers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    # -- keys ---------------------------------------------------------------
+
+    def _get(self, name, default=None):
+        deadline = self._expires.get(name)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        if isinstance(self._data.get(name), (dict, set)) and not self._data[name]:
+            # Like Redis, empty hashes, sets and sorted sets do not exist
+            del self._data[name]
+            self._expires.pop(name, None)
+        if name not in self._data and default is not None:
+            self._data[name] = default
+        return self._data.get(name)
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._get(name) is not None)
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._get(name) is not None:
+                    removed += 1
+                self._data.pop(name, None)
+                self._expires.pop(name, None)
+            return removed
+
+    def expire(self, name, seconds):
+        with self._lock:
+            if self._get(name) is None:
+                return False
+            self._expires[name] = time.monotonic() + float(seconds)
+            return True
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    # -- bitmaps ------------------------------------------------------------
+
+    def setbit(self, name, offset, value):
+        with self._lock:
+            bits = self._get(name, bytearray())
+            byte, bit = divmod(offset, 8)
+            if len(bits) <= byte:
+                bits.extend(bytes(byte + 1 - len(bits)))
+            mask = 0x80 >> bit
+            previous = int(bool(bits[byte] & mask))
+            if value:
+                bits[byte] |= mask
+            else:
+                bits[byte] &= ~mask
+            return previous
+
+    def getbit(self, name, offset):
+        with self._lock:
+            bits = self._get(name) or bytearray()
+            byte, bit = divmod(offset, 8)
+            if len(bits) <= byte:
+                return 0
+            return int(bool(bits[byte] & (0x80 >> bit)))
+
+    # -- sorted sets --------------------------------------------------------
+
+    def _sorted(self, name):
+        zset = self._get(name) or {}
+        return sorted(zset.items(), key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def _format(items, withscores):
+        if withscores:
+            return [(member, score) for member, score in items]
+        return [member for member, _ in items]
+
+    def zadd(self, name, mapping, nx=False, xx=False):
+        with self._lock:
+            zset = self._get(name, {})
+            added = 0
+            for member, score in mapping.items():
+                member = str(member)
+                if member in zset:
+                    if nx:
+                        continue
+                else:
+                    if xx:
+                        continue
+                    added += 1
+                zset[member] = float(score)
+            return added
+
+    def zrem(self, name, *values):
+        with self._lock:
+            zset = self._get(name) or {}
+            removed = 0
+            for value in values:
+                if zset.pop(str(value), None) is not None:
+                    removed += 1
+            return removed
+
+    def zscore(self, name, value):
+        with self._lock:
+            return (self._get(name) or {}).get(str(value))
+
+    def zcard(self, name):
+        with self._lock:
+            return len(self._get(name) or {})
+
+    def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        with self._lock:
+            low, high = _parse_bound(min), _parse_bound(max)
+            items = [item for item in self._sorted(name) if _in_range(item[1], low, high)]
+            if start is not None and num is not None:
+                items = items[start:start + num] if num >= 0 else items[start:]
+            return self._format(items, withscores)
+
+    def zrevrangebyscore(self, name, max, min, start=None, num=None, withscores=False):
+        with self._lock:
+            low, high = _parse_bound(min), _parse_bound(max)
+            items = [item for item in reversed(self._sorted(name)) if _in_range(item[1], low, high)]
+            if start is not None and num is not None:
+                items = items[start:start + num] if num >= 0 else items[start:]
+            return self._format(items, withscores)
+
+    def zrevrange(self, name, start, end, withscores=False):
+        with self._lock:
+            items = list(reversed(self._sorted(name)))
+            end = len(items) + end if end < 0 else end
+            return self._format(items[start:end + 1], withscores)
+
+    def zremrangebyrank(self, name, min, max):
+        with self._lock:
+            items = self._sorted(name)
+            max = len(items) + max if max < 0 else max
+            doomed = items[min:max + 1]
+            return self.zrem(name, *[member for member, _ in doomed]) if doomed else 0
+
+    def zremrangebyscore(self, name, min, max):
+        with self._lock:
+            low, high = _parse_bound(min), _parse_bound(max)
+            doomed = [member for member, score in self._sorted(name) if _in_range(score, low, high)]
+            return self.zrem(name, *doomed) if doomed else 0
+
+    # -- hashes -------------------------------------------------------------
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            hash_ = self._get(name, {})
+            hash_[key] = str(int(hash_.get(key, 0)) + int(amount))
+            return int(hash_[key])
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._get(name) or {})
+
+    # -- sets ---------------------------------------------------------------
+
+    def sadd(self, name, *values):
+        with self._lock:
+            set_ = self._get(name, set())
+            before = len(set_)
+            set_.update(str(value) for value in values)
+            return len(set_) - before
+
+    def srem(self, name, *values):
+        with self._lock:
+            set_ = self._get(name) or set()
+            removed = 0
+            for value in values:
+                if str(value) in set_:
+                    set_.discard(str(value))
+                    removed += 1
+            return removed
+
+    def sismember(self, name, value):
+        with self._lock:
+            return str(value) in (self._get(name) or set())
+
+    def smembers(self, name):
+        with self._lock:
+            return set(self._get(name) or set())
+
+    def scard(self, name):
+        with self._lock:
+            return len(self._get(name) or set())
+
+    def spop(self, name, count=None):
+        with self._lock:
+            set_ = self._get(name) or set()
+            if count is None:
+                return set_.pop() if set_ else None
+            return [set_.pop() for _ in range(min(count, len(set_)))]
+
+    # -- pipelines ----------------------------------------------------------
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    """Queues commands and runs them atomically against an InMemoryRedis"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+    def execute(self):
+        with self._client._lock:
+            commands, self._commands = self._commands, []
+            return [method(*args, **kwargs) for method, args, kwargs in commands]
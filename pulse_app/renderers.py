@@ -0,0 +1,28 @@
+"""JSON renderer backed by orjson, enabled with ``settings.PULSE_FAST_API``.
+
+Produces the same compact UTF-8 output as DRF's JSONRenderer, including UTC
+datetimes written with a 'Z' suffix. Types orjson does not handle natively go
+through DRF's encoder. Without orjson installed it behaves exactly like
+JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
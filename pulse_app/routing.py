@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .consumers import ChatConsumer, NotificationConsumer, PostUpdatesConsumer
+
+websocket_urlpatterns = [
+    path('ws/posts/', PostUpdatesConsumer.as_asgi()),
+    path('ws/chats/<uuid:chat_id>/', ChatConsumer.as_asgi()),
+    path('ws/notifications/', NotificationConsumer.as_asgi()),
+]
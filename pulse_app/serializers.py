@@ -1,32 +1,78 @@
 from rest_framework import serializers
+from rest_framework.pagination import Cursor, CursorPagination
+from django.urls import reverse
 from .models import (
     User, Post, Like, Comment, Poll, PollOption, PollVote,
     Follow, Chat, Message, Notification, Repost
 )
 from django.contrib.auth import authenticate
-from django.utils import timezone
 
+# Likes y comentarios incluidos en las vistas previas expandidas de un post
+PREVIEW_SIZE = 3
+# Caracteres del texto de un post incluidos en el resumen de una notificación
+TEXT_PREVIEW_LENGTH = 100
 
-class UserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
-    posts_count = serializers.SerializerMethodField()
 
+def _query_param_set(context, name):
+    request = context.get('request')
+    if request is None:
+        return None
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+def _text_preview(text):
+    text = text or ''
+    if len(text) <= TEXT_PREVIEW_LENGTH:
+        return text
+    return text[:TEXT_PREVIEW_LENGTH - 1].rstrip() + '…'
+
+
+class SparseFieldsMixin:
+    """
+    Campos dispersos para el serializer raíz de una respuesta:
+    - ``?fields=id,likes_count`` devuelve solo esos campos
+    - los campos de ``Meta.expandable_fields`` solo se incluyen con ``?expand=campo``
+    Los serializers anidados se devuelven completos.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if root is not self and getattr(root, 'child', None) is not self:
+            return fields
+
+        expand = _query_param_set(self.context, 'expand') or set()
+        for name in getattr(self.Meta, 'expandable_fields', []):
+            if name not in expand:
+                fields.pop(name, None)
+
+        only = _query_param_set(self.context, 'fields')
+        if only:
+            for name in list(fields):
+                if name not in only:
+                    fields.pop(name)
+        return fields
+
+
+class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
                   'bio', 'profile_photo', 'is_private', 'created_at',
                   'followers_count', 'following_count', 'posts_count']
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'followers_count', 'following_count', 'posts_count']
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
 
-    def get_following_count(self, obj):
-        return obj.following.count()
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Usuario sin contadores, para listas anidadas (likes, comentarios)"""
 
-    def get_posts_count(self, obj):
-        return obj.posts.count()
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_photo']
+        read_only_fields = fields
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -74,7 +120,7 @@ class PollSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserSummarySerializer(read_only=True)
 
     class Meta:
         model = Comment
@@ -83,7 +129,7 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserSummarySerializer(read_only=True)
 
     class Meta:
         model = Like
@@ -91,13 +137,24 @@ class LikeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class PostSerializer(serializers.ModelSerializer):
+class CommentCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = '-created_at'
+
+
+class PostCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    likes = LikeSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    likes = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
     poll = PollSerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
     time_remaining_seconds = serializers.SerializerMethodField()
+    life_seconds_remaining = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -106,27 +163,54 @@ class PostSerializer(serializers.ModelSerializer):
                   'life_seconds_remaining', 'time_remaining_seconds', 'likes_count', 'comments_count',
                   'reposts_count', 'likes', 'comments', 'poll', 'is_liked']
         read_only_fields = ['id', 'created_at', 'expires_at', 'is_expired',
-                           'likes_count', 'comments_count', 'reposts_count', 'time_remaining_seconds']
+                           'likes_count', 'comments_count', 'reposts_count', 'time_remaining_seconds',
+                           'life_seconds_remaining']
+        # Solo se incluyen con ?expand=likes,comments, como vista previa acotada
+        expandable_fields = ['likes', 'comments']
+
+    def get_likes(self, obj):
+        """Últimos PREVIEW_SIZE likes (precargados por la vista con to_attr='likes_preview')"""
+        likes = getattr(obj, 'likes_preview', None)
+        if likes is None:
+            likes = obj.likes.select_related('user').order_by('-created_at')[:PREVIEW_SIZE]
+        return LikeSerializer(likes, many=True, context=self.context).data
+
+    def get_comments(self, obj):
+        """Últimos PREVIEW_SIZE comentarios y la URL con cursor para leer el resto"""
+        comments = getattr(obj, 'comments_preview', None)
+        if comments is None:
+            comments = list(obj.comments.select_related('user').order_by('-created_at')[:PREVIEW_SIZE])
+
+        next_url = None
+        request = self.context.get('request')
+        if request is not None and len(comments) == PREVIEW_SIZE and obj.comments_count > PREVIEW_SIZE:
+            paginator = CommentCursorPagination()
+            paginator.base_url = request.build_absolute_uri(reverse('post-comments', args=[obj.pk]))
+            next_url = paginator.encode_cursor(
+                Cursor(offset=0, reverse=False, position=str(comments[-1].created_at))
+            )
+
+        return {
+            'results': CommentSerializer(comments, many=True, context=self.context).data,
+            'next': next_url,
+        }
 
     def get_is_liked(self, obj):
+        # Anotado por Post.objects.with_viewer_state cuando la vista lo usa
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
 
     def get_time_remaining_seconds(self, obj):
-        """Calcula el tiempo restante en el servidor basado en created_at + initial_life_seconds"""
-        if obj.is_expired:
-            return 0
-        
-        # Calcular el tiempo de expiración basado en created_at + initial_life_seconds
-        def get_time_remaining_seconds(self, obj):
-            if obj.is_expired or not obj.expires_at:
-                return 0
-
-            remaining = (obj.expires_at - timezone.now()).total_seconds()
-            return max(0, int(remaining))
+        """Tiempo restante calculado a partir de expires_at"""
+        return obj.time_remaining_seconds
 
+    def get_life_seconds_remaining(self, obj):
+        # La columna ya no se actualiza periódicamente; se expone el valor derivado
+        return obj.time_remaining_seconds
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
@@ -150,36 +234,55 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'chat', 'sender', 'content_type', 'content', 
+        fields = ['id', 'chat', 'seq', 'sender', 'content_type', 'content', 
                   'is_read', 'created_at']
-        read_only_fields = ['id', 'sender', 'created_at']
+        read_only_fields = ['id', 'chat', 'seq', 'sender', 'created_at']
 
 
 class ChatSerializer(serializers.ModelSerializer):
-    participants = UserSerializer(many=True, read_only=True)
-    last_message = serializers.SerializerMethodField()
+    participants = UserSummarySerializer(many=True, read_only=True)
+    last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ['id', 'participants', 'last_message', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'participants', 'last_message', 'last_message_at', 'unread_count',
+                  'created_at', 'updated_at']
+        read_only_fields = ['id', 'last_message_at', 'created_at', 'updated_at']
+
+    def get_unread_count(self, obj):
+        # Anotado por Chat.objects.with_unread_count
+        return getattr(obj, 'unread_count', None) or 0
 
-    def get_last_message(self, obj):
-        message = obj.messages.first()
-        if message:
-            return MessageSerializer(message).data
-        return None
+
+class PostSummarySerializer(serializers.ModelSerializer):
+    """Post reducido para notificaciones: sin autor, likes, comentarios ni encuesta"""
+    text_preview = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = ['id', 'post_type', 'text_preview', 'expires_at',
+                  'likes_count', 'comments_count', 'reposts_count']
+        read_only_fields = fields
+
+    def get_text_preview(self, obj):
+        return _text_preview(obj.text_content)
+
+
+class NotificationCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = '-created_at'
 
 
 class NotificationSerializer(serializers.ModelSerializer):
-    actor = UserSerializer(read_only=True)
-    post = PostSerializer(read_only=True)
+    actor = UserSummarySerializer(read_only=True)
+    post = PostSummarySerializer(read_only=True)
 
     class Meta:
         model = Notification
-        fields = ['id', 'notification_type', 'actor', 'post', 'payload',
-                  'is_read', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'notification_type', 'actor', 'actor_count', 'actor_sample',
+                  'post', 'payload', 'is_read', 'created_at']
+        read_only_fields = ['id', 'actor_count', 'actor_sample', 'created_at']
 
 
 class RepostSerializer(serializers.ModelSerializer):
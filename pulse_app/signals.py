@@ -0,0 +1,64 @@
+"""Keep denormalized state in sync: User counters with Follow and Post rows, chat inbox state with Message rows"""
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import live, notifications
+from .models import Chat, ChatParticipant, Follow, Message, Notification, Post, User
+
+
+def _change(user_id, field, delta):
+    """Atomically add ``delta`` to a counter of a user, never going below 0"""
+    User.objects.filter(pk=user_id).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def change_follow_counts(follower_id, followee_id, delta):
+    _change(followee_id, 'followers_count', delta)
+    _change(follower_id, 'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    # Las solicitudes pendientes se cuentan al aceptarse (Follow.accept)
+    if created and instance.status == 'accepted':
+        change_follow_counts(instance.follower_id, instance.followee_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if instance.status == 'accepted':
+        change_follow_counts(instance.follower_id, instance.followee_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        _change(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _change(instance.author_id, 'posts_count', -1)
+    live.mark_dirty([instance.pk])
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    Chat.objects.filter(pk=instance.chat_id).update(
+        last_message=instance,
+        last_message_at=instance.created_at,
+        updated_at=instance.created_at
+    )
+    ChatParticipant.objects.filter(chat_id=instance.chat_id).exclude(
+        user_id=instance.sender_id
+    ).update(unread_count=F('unread_count') + 1)
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    # Las inserciones con bulk_create llaman a notifications_created directamente
+    if created:
+        notifications.notifications_created([instance])
@@ -1,47 +1,76 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
-from .models import Post, Notification
+from .models import Post
+from . import counters, expiry, live
 from datetime import timedelta
 
 
 @shared_task
-def check_and_expire_posts():
+def check_and_expire_posts(chunk_size=None):
     """
-    Tarea para verificar y expirar posts cuyo tiempo de vida ha terminado.
-    Se ejecuta cada minuto.
+    Barrido de respaldo para expirar posts cuyo tiempo de vida ha terminado.
+    Se ejecuta cada minuto y procesa los posts en lotes de ``chunk_size``
+    (por defecto ``settings.PULSE_EXPIRY_CHUNK_SIZE``). Recoge los posts que
+    la cola de expiración no llegó a procesar.
     """
-    now = timezone.now()
-    expired_posts = Post.objects.filter(
-        expires_at__lte=now,
-        is_expired=False
-    )
-    
-    for post in expired_posts:
-        post.is_expired = True
-        post.life_seconds_remaining = 0
-        post.save()
-        
-        # Crear notificación al autor
-        Notification.objects.create(
-            user=post.author,
-            notification_type='expire',
-            post=post,
-            payload={
-                'message': f'Tu publicación ha expirado',
-                'total_life_seconds': post.total_life_seconds_reached,
-                'final_likes': post.likes_count
-            }
-        )
-    
-    return f'{len(expired_posts)} posts expirados'
+    summary = expiry.expire_due_posts(chunk_size=chunk_size)
+    return f"{summary['expired']} posts expirados en {summary['chunks']} lotes"
+
+
+@shared_task
+def expire_scheduled_posts():
+    """
+    Tarea para expirar los posts cuyo vencimiento ya llegó según la cola de
+    expiración. Se ejecuta cada segundo y solo toca los posts que expiraron.
+    """
+    summary = expiry.expire_scheduled_posts()
+    return f"{summary['expired']} posts expirados, {summary['rescheduled']} reprogramados"
+
+
+@shared_task
+def warn_expiring_posts():
+    """
+    Tarea para avisar a los autores de que su publicación está por expirar,
+    según ``NotificationSettings.expiring_threshold``. Se ejecuta cada 10 segundos.
+    """
+    summary = expiry.warn_expiring_posts()
+    return f"{summary['warned']} avisos de expiración enviados"
+
+
+@shared_task
+def flush_post_counters():
+    """
+    Tarea para volcar a la base de datos los likes, comentarios, reposts y
+    extensiones de vida acumulados en Redis. Solo se programa con
+    ``settings.PULSE_COUNTER_WRITE_BEHIND`` activo; se ejecuta cada 2 segundos.
+    """
+    summary = counters.flush_pending()
+    return f"{summary['flushed']} posts actualizados"
+
+
+@shared_task
+def broadcast_live_updates():
+    """
+    Tarea para enviar por WebSocket el estado de los posts que cambiaron
+    (likes, vida, expiración) desde la última ejecución, un mensaje por post.
+    Se ejecuta cada ``settings.PULSE_LIVE_TICK`` segundos.
+    """
+    summary = live.broadcast_updates()
+    return f"{summary['sent']} posts enviados"
 
 
 @shared_task
 def update_post_life():
     """
-    Tarea para actualizar el tiempo de vida restante de los posts.
-    Se ejecuta cada 30 segundos.
+    Tarea legacy para reescribir ``life_seconds_remaining`` en los posts activos.
+    Con ``settings.PULSE_DERIVED_POST_LIFE`` activo el tiempo restante se calcula
+    al leer a partir de ``expires_at`` (``Post.time_remaining_seconds``) y esta
+    tarea no escribe nada.
     """
+    if settings.PULSE_DERIVED_POST_LIFE:
+        return 'Tiempo de vida derivado de expires_at, nada que actualizar'
+
     now = timezone.now()
     active_posts = Post.objects.filter(
         is_expired=False,
@@ -53,7 +82,7 @@ def update_post_life():
         time_remaining = (post.expires_at - now).total_seconds()
         if time_remaining > 0:
             post.life_seconds_remaining = int(time_remaining)
-            post.save()
+            post.save(update_fields=['life_seconds_remaining'])
             updated_count += 1
     
     return f'{updated_count} posts actualizado'
@@ -0,0 +1,646 @@
+"""Tests for pulse_app.
+
+Run with the in-process Redis stand-in:
+
+    REDIS_URL=memory:// python manage.py test pulse_app
+"""
+import datetime
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import Q, QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import bloom, chats, counters, feed_cache, feeds, notifications, timelines
+from .models import Chat, ChatParticipant, Follow, Like, Message, Notification, Poll, PollOption, Post, PostInteraction, User
+from .pagination import decode_cursor, encode_cursor, paginate_feed, paginate_keys
+from .redis_store import get_redis
+from .renderers import FastJSONRenderer
+
+
+class CounterTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        self.author = User.objects.create_user('author')
+        self.post = Post.objects.create(author=self.author, post_type='text', text_content='hola')
+
+    def assertCounters(self, likes, engagement):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, likes)
+        self.assertEqual(self.post.engagement_score, engagement)
+
+    def test_like_then_double_unlike_clamps_at_zero(self):
+        counters.add_like(self.post)
+        counters.remove_like(self.post)
+        counters.remove_like(self.post)
+        self.assertCounters(likes=0, engagement=0)
+
+    def test_stale_instances_apply_every_change(self):
+        # Dos peticiones con el mismo post cargado antes de cualquier cambio
+        first = Post.objects.get(pk=self.post.pk)
+        second = Post.objects.get(pk=self.post.pk)
+        counters.add_like(first)
+        counters.add_like(second)
+        self.assertCounters(likes=2, engagement=2)
+
+        counters.remove_like(first)
+        counters.remove_like(second)
+        counters.remove_like(first)
+        self.assertCounters(likes=0, engagement=0)
+
+    def test_engagement_never_negative(self):
+        counters.add_comment(self.post)
+        counters.remove_like(self.post)
+        counters.remove_repost(self.post)
+        self.assertCounters(likes=0, engagement=1)
+
+    def test_like_extends_life_from_expires_at(self):
+        expires_at = self.post.expires_at
+        counters.add_like(self.post)
+        self.post.refresh_from_db()
+        extension = datetime.timedelta(seconds=counters.LIKE_LIFE_EXTENSION_SECONDS)
+        self.assertEqual(self.post.expires_at, expires_at + extension)
+        self.assertEqual(self.post.total_life_seconds_reached, counters.LIKE_LIFE_EXTENSION_SECONDS)
+
+    def test_like_on_overdue_post_extends_from_now(self):
+        Post.objects.filter(pk=self.post.pk).update(expires_at=timezone.now() - datetime.timedelta(hours=1))
+        before = timezone.now()
+        counters.add_like(self.post)
+        self.post.refresh_from_db()
+        extension = datetime.timedelta(seconds=counters.LIKE_LIFE_EXTENSION_SECONDS)
+        self.assertGreaterEqual(self.post.expires_at, before + extension)
+        self.assertLessEqual(self.post.expires_at, timezone.now() + extension)
+
+    def test_unlike_keeps_granted_life(self):
+        counters.add_like(self.post)
+        self.post.refresh_from_db()
+        expires_at = self.post.expires_at
+        counters.remove_like(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.expires_at, expires_at)
+
+
+@override_settings(PULSE_ENGAGEMENT_HALF_LIFE=600)
+class DecayedEngagementTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def score(self, engagement, age, remaining):
+        created_at = self.now - datetime.timedelta(seconds=age)
+        expires_at = self.now + datetime.timedelta(seconds=remaining)
+        return counters.decayed_engagement(engagement, created_at, expires_at, self.now)
+
+    def test_fresh_post_keeps_its_score(self):
+        self.assertEqual(self.score(10, age=0, remaining=300), 10)
+
+    def test_score_halves_every_half_life(self):
+        # Misma fracción de vida restante: solo cambia el decaimiento por edad
+        self.assertAlmostEqual(self.score(8, age=600, remaining=600), 8 * 0.5 * 0.5)
+        self.assertAlmostEqual(self.score(8, age=1200, remaining=1200), 8 * 0.25 * 0.5)
+
+    def test_old_popular_post_ranks_below_fresh_one(self):
+        self.assertLess(self.score(20, age=3600, remaining=60), self.score(5, age=60, remaining=300))
+
+    def test_post_about_to_expire_ranks_below_one_with_life_left(self):
+        self.assertLess(self.score(10, age=300, remaining=10), self.score(10, age=300, remaining=600))
+
+    def test_expired_post_scores_zero(self):
+        self.assertEqual(self.score(10, age=300, remaining=-1), 0)
+
+
+@override_settings(PULSE_COUNTER_WRITE_BEHIND=True)
+class WriteBehindCounterTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        self.author = User.objects.create_user('author')
+        self.post = Post.objects.create(author=self.author, post_type='text', text_content='hola')
+        self.expires_at = self.post.expires_at
+
+    def test_deltas_are_buffered_until_flushed(self):
+        counters.add_like(self.post)
+        counters.add_like(Post.objects.get(pk=self.post.pk))
+        counters.add_comment(self.post)
+
+        stored = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((stored.likes_count, stored.comments_count), (0, 0))
+        self.assertEqual(counters.pending_post_ids(), {str(self.post.pk)})
+        merged = counters.apply_pending([stored])[0]
+        self.assertEqual((merged.likes_count, merged.comments_count, merged.engagement_score), (2, 1, 3))
+
+        self.assertEqual(counters.flush_pending()['flushed'], 1)
+        stored.refresh_from_db()
+        self.assertEqual((stored.likes_count, stored.comments_count, stored.engagement_score), (2, 1, 3))
+        extension = datetime.timedelta(seconds=2 * counters.LIKE_LIFE_EXTENSION_SECONDS)
+        self.assertEqual(stored.expires_at, self.expires_at + extension)
+        self.assertEqual(counters.pending_post_ids(), set())
+        self.assertEqual(counters.pending_deltas([self.post.pk]), {})
+
+    def test_flush_clamps_at_zero(self):
+        counters.remove_like(self.post)
+        counters.remove_repost(self.post)
+        counters.flush_pending()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.reposts_count, self.post.engagement_score), (0, 0, 0))
+
+    def test_failed_flush_keeps_deltas(self):
+        counters.add_like(self.post)
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError), \
+                self.assertLogs('pulse_app.counters', 'WARNING'):
+            summary = counters.flush_pending()
+        self.assertEqual(summary, {'flushed': 0, 'requeued': 1})
+        self.assertEqual(counters.pending_post_ids(), {str(self.post.pk)})
+
+        # Un like que llega antes del reintento se suma a los devueltos
+        counters.add_like(self.post)
+        counters.flush_pending()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+        self.assertEqual(counters.pending_post_ids(), set())
+
+
+class UserCounterTests(TestCase):
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana')
+        self.bob = User.objects.create_user('bob')
+
+    def assertCounters(self, user, followers, following, posts):
+        user.refresh_from_db()
+        self.assertEqual((user.followers_count, user.following_count, user.posts_count), (followers, following, posts))
+
+    def test_accepted_follow_counts_both_users(self):
+        follow = Follow.objects.create(follower=self.ana, followee=self.bob)
+        self.assertCounters(self.ana, followers=0, following=1, posts=0)
+        self.assertCounters(self.bob, followers=1, following=0, posts=0)
+
+        follow.delete()
+        self.assertCounters(self.ana, followers=0, following=0, posts=0)
+        self.assertCounters(self.bob, followers=0, following=0, posts=0)
+
+    def test_pending_request_counts_once_accepted(self):
+        follow = Follow.objects.create(follower=self.ana, followee=self.bob, status='pending')
+        self.assertCounters(self.bob, followers=0, following=0, posts=0)
+
+        self.assertTrue(follow.accept())
+        # Aceptar dos veces no vuelve a contar
+        self.assertFalse(Follow.objects.get(pk=follow.pk).accept())
+        self.assertCounters(self.ana, followers=0, following=1, posts=0)
+        self.assertCounters(self.bob, followers=1, following=0, posts=0)
+
+    def test_rejected_request_is_not_subtracted(self):
+        Follow.objects.create(follower=self.ana, followee=self.bob, status='pending').delete()
+        self.assertCounters(self.bob, followers=0, following=0, posts=0)
+
+    def test_posts_count_follows_created_and_deleted_posts(self):
+        post = Post.objects.create(author=self.ana, post_type='text', text_content='hola')
+        Post.objects.create(author=self.ana, post_type='text', text_content='adiós')
+        self.assertCounters(self.ana, followers=0, following=0, posts=2)
+        post.delete()
+        self.assertCounters(self.ana, followers=0, following=0, posts=1)
+
+    def test_counters_never_go_negative(self):
+        post = Post.objects.create(author=self.ana, post_type='text', text_content='hola')
+        User.objects.filter(pk=self.ana.pk).update(posts_count=0)
+        post.delete()
+        self.assertCounters(self.ana, followers=0, following=0, posts=0)
+
+    def test_reconcile_fixes_drifted_users_only(self):
+        Follow.objects.create(follower=self.ana, followee=self.bob)
+        Post.objects.create(author=self.bob, post_type='text', text_content='hola')
+        User.objects.filter(pk=self.bob.pk).update(followers_count=7, posts_count=0)
+
+        out = StringIO()
+        call_command('reconcile_user_counters', '--dry-run', stdout=out)
+        self.assertIn('1 usuarios desajustados', out.getvalue())
+        self.assertCounters(self.bob, followers=7, following=0, posts=0)
+
+        out = StringIO()
+        call_command('reconcile_user_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('1 usuarios corregidos', out.getvalue())
+        self.assertCounters(self.ana, followers=0, following=1, posts=0)
+        self.assertCounters(self.bob, followers=1, following=0, posts=1)
+
+        out = StringIO()
+        call_command('reconcile_user_counters', stdout=out)
+        self.assertIn('0 usuarios corregidos', out.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        now = timezone.now()
+        self.posts = [Post.objects.create(author=self.author, post_type='text', text_content=str(i)) for i in range(5)]
+        # Dos posts con el mismo created_at: el id desempata
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[:2]]).update(created_at=now)
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[2:]]).update(created_at=now - datetime.timedelta(minutes=1))
+        self.keys = list(
+            Post.objects.order_by('-created_at', '-id').values_list('created_at', 'id')
+        )
+
+    def test_cursor_round_trip(self):
+        created_at, post_id = self.keys[0]
+        self.assertEqual(decode_cursor(encode_cursor(created_at, post_id)), (created_at, post_id))
+
+    def test_tampered_cursors_are_rejected(self):
+        cursor = encode_cursor(*self.keys[0])
+        for tampered in ['', 'no-es-base64!', cursor[:-3], cursor + 'AAAA', 'x' + cursor[1:],
+                         encode_cursor(self.keys[0][0], 'no-es-un-uuid')]:
+            self.assertIsNone(decode_cursor(tampered), tampered)
+        self.assertIsNone(decode_cursor(None))
+
+    def test_tampered_cursor_serves_the_first_page(self):
+        page = paginate_feed(Post.objects.all(), 'no-es-base64!', page_size=2)
+        self.assertEqual([(p.created_at, p.pk) for p in page.items], self.keys[:2])
+
+    def test_pages_cover_the_feed_once_across_ties(self):
+        seen, cursor = [], None
+        while True:
+            page = paginate_feed(Post.objects.all(), cursor, page_size=2)
+            seen.extend((p.created_at, p.pk) for p in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.keys)
+
+    def test_paginate_keys_matches_paginate_feed(self):
+        cursor = paginate_feed(Post.objects.all(), page_size=3).next_cursor
+        by_keys = paginate_keys(self.keys, cursor, page_size=3)
+        by_rows = paginate_feed(Post.objects.all(), cursor, page_size=3)
+        self.assertEqual(by_keys.items, [(p.created_at, p.pk) for p in by_rows.items])
+        self.assertFalse(by_keys.has_next)
+
+
+class ReactedFilterTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        self.reader = User.objects.create_user('reader')
+        self.author = User.objects.create_user('author')
+        self.posts = [Post.objects.create(author=self.author, post_type='text', text_content=str(i)) for i in range(6)]
+        self.ids = [post.pk for post in self.posts]
+
+    def react(self, post):
+        PostInteraction.objects.create(user=self.reader, post=post, has_reacted=True)
+
+    def test_seeded_from_reactions_keeping_order(self):
+        self.react(self.posts[1])
+        self.react(self.posts[4])
+        PostInteraction.objects.create(user=self.reader, post=self.posts[2], has_reacted=False)
+        self.assertEqual(bloom.filter_unreacted(self.reader.pk, self.ids), [self.ids[i] for i in (0, 2, 3, 5)])
+
+    def test_reactions_after_seeding_are_added(self):
+        self.assertEqual(bloom.filter_unreacted(self.reader.pk, self.ids), self.ids)
+        bloom.add_reacted(self.reader.pk, self.ids[3])
+        self.assertNotIn(self.ids[3], bloom.filter_unreacted(self.reader.pk, self.ids))
+
+    def test_reaction_before_seeding_is_read_from_the_database(self):
+        # Sin generación sembrada add_reacted no hace nada; la siembra la lee de PostInteraction
+        self.react(self.posts[0])
+        bloom.add_reacted(self.reader.pk, self.ids[0])
+        self.assertNotIn(self.ids[0], bloom.filter_unreacted(self.reader.pk, self.ids))
+
+    @override_settings(PULSE_REACTED_FILTER_GENERATION=60)
+    def test_expired_posts_age_out_with_the_generation(self):
+        self.react(self.posts[0])
+        now = timezone.now()
+        self.assertNotIn(self.ids[0], bloom.filter_unreacted(self.reader.pk, self.ids, now))
+
+        Post.objects.filter(pk=self.ids[0]).update(expires_at=now)
+        later = now + datetime.timedelta(seconds=60)
+        self.assertIn(self.ids[0], bloom.filter_unreacted(self.reader.pk, self.ids, later))
+
+    def test_unavailable_filter_returns_none(self):
+        with mock.patch('pulse_app.bloom.get_redis', side_effect=RedisError), \
+                self.assertLogs('pulse_app.bloom', 'WARNING'):
+            self.assertIsNone(bloom.filter_unreacted(self.reader.pk, self.ids))
+
+
+class FeedMergeTests(TestCase):
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana')
+        self.bob = User.objects.create_user('bob')
+        now = timezone.now()
+        self.posts = []
+        for i in range(9):
+            post = Post.objects.create(author=self.ana if i % 3 else self.bob, post_type='text', text_content=str(i))
+            # Empates de created_at en parejas, entre autores distintos
+            Post.objects.filter(pk=post.pk).update(created_at=now - datetime.timedelta(minutes=i // 2))
+            self.posts.append(post)
+
+    def expected(self, queryset, after=None):
+        if after is not None:
+            created_at, post_id = after
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id))
+        return list(queryset.order_by('-created_at', '-id').values_list('created_at', 'id'))
+
+    def test_merge_interleaves_newest_first_and_drops_duplicates(self):
+        now = timezone.now()
+        a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        first = [(now, a), (now - datetime.timedelta(minutes=2), c)]
+        second = [(now - datetime.timedelta(minutes=1), b), (now - datetime.timedelta(minutes=2), c)]
+        self.assertEqual([key[1] for key in feeds.merge(iter(first), iter(second))], [a, b, c])
+
+    def test_stream_reads_across_batches(self):
+        posts = Post.objects.all()
+        self.assertEqual(list(feeds.stream(posts, batch_size=2)), self.expected(posts))
+        after = self.expected(posts)[2]
+        self.assertEqual(list(feeds.stream(posts, after, batch_size=2)), self.expected(posts, after))
+
+    def test_merged_keys_match_a_single_ordered_query(self):
+        sources = [
+            Post.objects.filter(author=self.ana),
+            Post.objects.filter(author=self.bob),
+            # Solapa con las otras fuentes: cada post sale una sola vez
+            Post.objects.filter(text_content__in=['0', '1', '2']),
+        ]
+        everything = self.expected(Post.objects.all())
+        self.assertEqual(feeds.merged_keys(sources, limit=100), everything)
+        self.assertEqual(feeds.merged_keys(sources, limit=4, after=everything[1]), everything[2:6])
+
+    def test_merge_reads_lazily(self):
+        sources = [Post.objects.filter(author=self.ana), Post.objects.filter(author=self.bob)]
+        # Una consulta por fuente basta para las primeras claves
+        with self.assertNumQueries(2):
+            feeds.merged_keys(sources, limit=3)
+
+
+class TimelineTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        self.reader = User.objects.create_user('reader')
+        self.author = User.objects.create_user('author')
+
+    def test_empty_timeline_is_not_rebuilt_on_every_read(self):
+        self.assertEqual(timelines.following_keys(self.reader), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(timelines.following_keys(self.reader), [])
+
+    def test_posts_are_pushed_to_a_rebuilt_empty_timeline(self):
+        Follow.objects.create(follower=self.reader, followee=self.author)
+        timelines.invalidate(self.reader.pk)
+        self.assertEqual(timelines.following_keys(self.reader), [])
+
+        post = Post.objects.create(author=self.author, post_type='text', text_content='hola')
+        timelines.fan_out_post(post)
+        self.assertEqual(timelines.following_keys(self.reader), [(post.created_at, post.pk)])
+
+
+class FeedCacheTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        cache.clear()
+        self.viewer = User.objects.create_user('viewer', password='p')
+        self.client.force_login(self.viewer)
+
+    def test_unknown_feed_type_is_served_as_for_you(self):
+        response = self.client.get('/feed/page/?feed=bogus')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(feed_cache.get(self.viewer.pk, 'for_you'))
+        self.assertIsNone(feed_cache.get(self.viewer.pk, 'bogus'))
+
+
+class ChatTests(TestCase):
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana')
+        self.bob = User.objects.create_user('bob')
+        self.chat = Chat.objects.create()
+        ChatParticipant.objects.create(chat=self.chat, user=self.ana)
+        ChatParticipant.objects.create(chat=self.chat, user=self.bob)
+
+    def test_seq_is_allocated_strictly_in_order(self):
+        for i in range(6):
+            chats.send_message(self.chat.pk, self.ana if i % 2 else self.bob, f'mensaje {i}')
+        # Un Message creado con una instancia de Chat desactualizada también toma el siguiente
+        Message.objects.create(chat=self.chat, sender=self.ana, content='tarde')
+
+        seqs = list(Message.objects.filter(chat=self.chat).order_by('created_at').values_list('seq', flat=True))
+        self.assertEqual(seqs, list(range(1, 8)))
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.last_seq, 7)
+        self.assertEqual([m['seq'] for m in chats.messages_after(self.chat.pk, 4)], [5, 6, 7])
+
+    def test_message_is_saved_when_channel_layer_is_down(self):
+        layer = mock.Mock(group_send=mock.AsyncMock(side_effect=RedisError))
+        with mock.patch('pulse_app.chats.get_channel_layer', return_value=layer), \
+                self.assertLogs('pulse_app.chats', 'WARNING'):
+            message = chats.send_message(self.chat.pk, self.ana, 'hola')
+        self.assertEqual(message.seq, 1)
+        self.assertTrue(Message.objects.filter(pk=message.pk).exists())
+
+
+class UnreadCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user')
+        self.actor = User.objects.create_user('actor')
+
+    def notify(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                Notification.objects.create(user=self.user, notification_type='follow', actor=self.actor)
+
+    def test_counted_once_then_read_from_the_cache(self):
+        self.notify(2)
+        self.assertEqual(notifications.unread_count(self.user.pk), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.user.pk), 2)
+
+    @override_settings(PULSE_REDIS_IN_MEMORY=False)
+    def test_shared_counter_is_adjusted_in_place(self):
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+        self.notify(3)
+        notifications.marked_read(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.user.pk), 2)
+
+        notifications.reset_unread(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.user.pk), 0)
+
+    @override_settings(PULSE_REDIS_IN_MEMORY=False)
+    def test_increment_without_a_cached_counter_is_skipped(self):
+        self.notify()
+        self.assertIsNone(cache.get(notifications._key(self.user.pk)))
+        self.assertEqual(notifications.unread_count(self.user.pk), 1)
+
+    @override_settings(PULSE_REDIS_IN_MEMORY=False)
+    def test_counter_below_zero_is_counted_again(self):
+        self.notify()
+        self.assertEqual(notifications.unread_count(self.user.pk), 1)
+        notifications.marked_read(self.user.pk, count=2)
+        self.assertIsNone(cache.get(notifications._key(self.user.pk)))
+        self.assertEqual(notifications.unread_count(self.user.pk), 1)
+
+    def test_process_local_counter_is_dropped_instead_of_adjusted(self):
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+        self.notify()
+        self.assertIsNone(cache.get(notifications._key(self.user.pk)))
+        self.assertEqual(notifications.unread_count(self.user.pk), 1)
+
+    def test_unavailable_cache_counts_from_the_database(self):
+        self.notify(2)
+        with mock.patch.object(cache, 'get', side_effect=RedisError), \
+                mock.patch.object(cache, 'set', side_effect=RedisError), \
+                self.assertLogs('pulse_app.notifications', 'WARNING'):
+            self.assertEqual(notifications.unread_count(self.user.pk), 2)
+
+
+@override_settings(
+    PULSE_NOTIFICATION_AGGREGATION=True,
+    PULSE_NOTIFICATION_WINDOW=60 * 60,
+    PULSE_NOTIFICATION_ACTOR_SAMPLE=2
+)
+class NotificationAggregationTests(TestCase):
+
+    def setUp(self):
+        get_redis().flushall()
+        self.author = User.objects.create_user('author')
+        self.fans = [User.objects.create_user(f'fan{i}') for i in range(4)]
+        self.post = Post.objects.create(author=self.author, post_type='text', text_content='hola')
+        self.now = timezone.now()
+
+    def like(self, fan, minutes=0):
+        at = self.now + datetime.timedelta(minutes=minutes)
+        with mock.patch('django.utils.timezone.now', return_value=at):
+            return notifications.notify(self.author, 'like', actor=fan, post=self.post)
+
+    def test_window_is_anchored_on_the_first_event(self):
+        first = self.like(self.fans[0])
+        started_at = first.window_started_at
+        # Cada evento llega dentro de la ventana del anterior, pero no del primero
+        self.assertEqual(self.like(self.fans[1], minutes=40).pk, first.pk)
+        later = self.like(self.fans[2], minutes=80)
+
+        self.assertNotEqual(later.pk, first.pk)
+        self.assertEqual(later.actor_count, 1)
+        first.refresh_from_db()
+        self.assertEqual(first.actor_count, 2)
+        self.assertEqual(first.window_started_at, started_at)
+        self.assertEqual(first.created_at, self.now + datetime.timedelta(minutes=40))
+
+    def test_repeat_actor_outside_the_sample_is_not_counted_again(self):
+        for fan in self.fans[:3]:
+            notification = self.like(fan)
+        self.assertNotIn(str(self.fans[0].pk), notification.actor_sample)
+
+        notification = self.like(self.fans[0], minutes=1)
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(Notification.objects.filter(user=self.author).count(), 1)
+
+    def test_without_the_actor_set_only_the_sample_is_checked(self):
+        for fan in self.fans[:3]:
+            notification = self.like(fan)
+        get_redis().flushall()
+
+        self.assertEqual(self.like(self.fans[2]).actor_count, 3)
+        # Fuera de la muestra y sin el conjunto completo: el recuento es aproximado
+        self.assertEqual(self.like(self.fans[0]).actor_count, 4)
+
+
+class FastPathParityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user('viewer', password='p')
+        cls.author = User.objects.create_user('author', password='p', first_name='Ana')
+        cls.other = User.objects.create_user('other', password='p')
+        Follow.objects.create(follower=cls.viewer, followee=cls.author)
+
+        cls.posts = [
+            Post.objects.create(author=cls.author, post_type='text', text_content=f'post {i} ' + 'x' * 120)
+            for i in range(5)
+        ]
+        cls.posts.append(Post.objects.create(author=cls.viewer, post_type='text', text_content='propio'))
+        poll_post = Post.objects.create(author=cls.author, post_type='poll', text_content='encuesta')
+        poll = Poll.objects.create(post=poll_post, question='¿Sí o no?')
+        PollOption.objects.create(poll=poll, text='Sí', votes=2)
+        PollOption.objects.create(poll=poll, text='No')
+        cls.posts.append(poll_post)
+
+        Like.objects.create(post=cls.posts[0], user=cls.viewer)
+        Like.objects.create(post=cls.posts[2], user=cls.viewer)
+        Post.objects.filter(pk=cls.posts[0].pk).update(likes_count=1)
+
+        Notification.objects.create(user=cls.viewer, notification_type='like', actor=cls.author, post=cls.posts[5])
+        Notification.objects.create(
+            user=cls.viewer, notification_type='like', actor=cls.other, post=cls.posts[5],
+            actor_count=3, actor_sample=[str(cls.other.pk), str(cls.author.pk)]
+        )
+        Notification.objects.create(user=cls.viewer, notification_type='follow', actor=cls.author)
+        Notification.objects.create(
+            user=cls.viewer, notification_type='post_expiring', post=cls.posts[5],
+            payload={'message': 'Tu publicación está por expirar', 'seconds_remaining': 30}
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        # Tiempo fijo: el tiempo restante se deriva de timezone.now() al serializar
+        now = timezone.now()
+        patcher = mock.patch('django.utils.timezone.now', return_value=now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertParity(self, url):
+        with override_settings(PULSE_FAST_API=False):
+            slow = self.client.get(url)
+        with override_settings(PULSE_FAST_API=True):
+            fast = self.client.get(url)
+        self.assertEqual(slow.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.json(), slow.json())
+        return slow.json()
+
+    def test_posts_list(self):
+        data = self.assertParity('/api/posts/')
+        self.assertEqual(len(data['results']), len(self.posts))
+
+    def test_posts_list_sparse_fields(self):
+        data = self.assertParity('/api/posts/?fields=id,text_content,is_liked,poll')
+        self.assertEqual(set(data['results'][0]), {'id', 'text_content', 'is_liked', 'poll'})
+
+    def test_feed(self):
+        data = self.assertParity('/api/posts/feed/')
+        self.assertTrue(any(post['is_liked'] for post in data))
+
+    def test_trending(self):
+        self.assertParity('/api/posts/trending/')
+
+    def test_notifications(self):
+        data = self.assertParity('/api/notifications/')
+        self.assertEqual(len(data['results']), 4)
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_output_matches_json_renderer(self):
+        data = {
+            'utc': timezone.now(),
+            'utc_seconds': timezone.now().replace(microsecond=0),
+            'local': timezone.localtime(),
+            'date': datetime.date(2026, 10, 17),
+            'id': uuid.uuid4(),
+            'decimal': Decimal('1.5'),
+            'text': 'ñandú ❤',
+            'items': [1, 2.5, None, True],
+            1: 'clave numérica',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
@@ -0,0 +1,232 @@
+"""Materialized Following timelines, populated by fan-out on write.
+
+Each user's timeline is a Redis sorted set of post ids scored by the post's
+``created_at``. Posts and reposts are pushed to the timelines of the author's
+followers when they are created. Ids of posts that expire or are deleted stay
+in the timelines until they are pruned on the next read. Only timelines that
+already exist are written to; users who have been inactive long enough for
+their timeline to time out get it rebuilt from the database on their next
+read.
+
+Authors with at least ``settings.PULSE_FANOUT_FOLLOWER_THRESHOLD`` followers
+are not fanned out. Their posts and reposts are pulled at read time and
+merged into each reader's timeline, so posting stays cheap for popular
+accounts.
+"""
+import logging
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from . import feed_cache, feeds, metrics
+from .models import Follow, Post, Repost
+from .redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_KEY = 'pulse:timeline:{}'
+# Member kept in every rebuilt timeline (lowest score) so an empty timeline
+# still exists and is not rebuilt from the database on every read
+EMPTY_MARKER = 'empty'
+# Set of authors whose posts are pulled at read time instead of fanned out
+PULLED_AUTHORS_KEY = 'pulse:timeline:pulled_authors'
+
+
+def _key(user_id):
+    return TIMELINE_KEY.format(user_id)
+
+
+def _follower_ids(user_ids):
+    """Accepted followers of each user in ``user_ids``, as {followee_id: [follower_id, ...]}"""
+    followers = {user_id: [] for user_id in user_ids}
+    for follower_id, followee_id in Follow.objects.filter(
+        followee_id__in=user_ids,
+        status='accepted'
+    ).values_list('follower_id', 'followee_id'):
+        followers[followee_id].append(follower_id)
+    return followers
+
+
+def _audience(user):
+    """Accepted followers to fan out to, or [] if the account is pulled at read time"""
+    # Contador desnormalizado de seguidores aceptados (User.followers_count)
+    if user.followers_count >= settings.PULSE_FANOUT_FOLLOWER_THRESHOLD:
+        get_redis().sadd(PULLED_AUTHORS_KEY, str(user.pk))
+        metrics.incr('timeline_fanout_skipped')
+        return []
+
+    get_redis().srem(PULLED_AUTHORS_KEY, str(user.pk))
+    return _follower_ids([user.pk])[user.pk]
+
+
+def _push(user_ids, post_id, created_at):
+    """Add a post to the existing timelines of ``user_ids`` and trim them"""
+    redis = get_redis()
+    keys = [_key(user_id) for user_id in user_ids]
+
+    pipe = redis.pipeline()
+    for key in keys:
+        pipe.exists(key)
+    live_keys = [key for key, exists in zip(keys, pipe.execute()) if exists]
+    if not live_keys:
+        return 0
+
+    length = settings.PULSE_TIMELINE_LENGTH
+    pipe = redis.pipeline()
+    for key in live_keys:
+        pipe.zadd(key, {str(post_id): created_at.timestamp()})
+        pipe.zremrangebyrank(key, 0, -(length + 1))
+    pipe.execute()
+    metrics.incr('timeline_fanout_writes', len(live_keys))
+    return len(live_keys)
+
+
+def fan_out_post(post):
+    """Push a new post to its author's timeline and to their followers' timelines"""
+    user_ids = [post.author_id]
+    try:
+        user_ids += _audience(post.author)
+        return _push(user_ids, post.pk, post.created_at)
+    except RedisError:
+        logger.warning('Could not fan out post %s', post.pk, exc_info=True)
+        return 0
+    finally:
+        feed_cache.invalidate(user_ids)
+
+
+def fan_out_repost(repost):
+    """Push a reposted post to the timelines of the reposter's followers"""
+    post = repost.original_post
+    user_ids = []
+    try:
+        user_ids += _audience(repost.user)
+        return _push(user_ids, post.pk, post.created_at)
+    except RedisError:
+        logger.warning('Could not fan out repost %s', repost.pk, exc_info=True)
+        return 0
+    finally:
+        feed_cache.invalidate(user_ids)
+
+
+def invalidate(user_id):
+    """Drop a user's timeline and cached feeds so they are rebuilt on the next read (e.g. after a follow change)"""
+    try:
+        get_redis().delete(_key(user_id))
+    except RedisError:
+        logger.warning('Could not invalidate timeline of %s', user_id, exc_info=True)
+    feed_cache.invalidate([user_id])
+
+
+def _following_sources(user, now):
+    """Live posts from the user, the accounts they follow and those accounts' reposts, one queryset each"""
+    following_ids = list(Follow.objects.filter(
+        follower=user,
+        status='accepted'
+    ).values_list('followee_id', flat=True))
+    reposted_ids = Repost.objects.filter(
+        user_id__in=following_ids
+    ).values_list('original_post_id', flat=True)
+
+    live = Post.objects.filter(expires_at__gt=now)
+    return [
+        live.filter(author=user),
+        live.filter(author_id__in=following_ids),
+        live.filter(id__in=reposted_ids),
+    ]
+
+
+def _following_keys(user, now):
+    """(created_at, id) keys of the Following feed, newest first, computed from the database"""
+    return feeds.merged_keys(_following_sources(user, now), settings.PULSE_TIMELINE_LENGTH)
+
+
+def rebuild(user, now=None):
+    """Recompute a user's timeline from the database and store it"""
+    now = now or timezone.now()
+    entries = _following_keys(user, now)
+    key = _key(user.pk)
+
+    pipe = get_redis().pipeline()
+    pipe.delete(key)
+    mapping = {str(post_id): created_at.timestamp() for created_at, post_id in entries}
+    mapping[EMPTY_MARKER] = 0
+    pipe.zadd(key, mapping)
+    pipe.expire(key, settings.PULSE_TIMELINE_TTL)
+    pipe.execute()
+
+
+def _pulled_keys(user, pulled_author_ids, now):
+    """Keys of the live posts and reposts from the pulled authors that ``user`` follows"""
+    followed = list(Follow.objects.filter(
+        follower=user,
+        followee_id__in=pulled_author_ids,
+        status='accepted'
+    ).values_list('followee_id', flat=True))
+    if not followed:
+        return []
+
+    reposted_ids = Repost.objects.filter(
+        user_id__in=followed
+    ).values_list('original_post_id', flat=True)
+    live = Post.objects.filter(expires_at__gt=now)
+    return feeds.merged_keys(
+        [live.filter(author_id__in=followed), live.filter(id__in=reposted_ids)],
+        settings.PULSE_TIMELINE_LENGTH
+    )
+
+
+def following_keys(user, now=None):
+    """Return the (created_at, id) keys of the user's Following feed, newest first.
+
+    Reads the materialized timeline with a single range read, rebuilding it if
+    it has timed out, and checks which posts are still live with one
+    ``values_list`` query, so no post rows are loaded. Ids of posts that are
+    no longer live are pruned from the timeline on the way. Posts from
+    followed accounts above the fan-out threshold are pulled and merged in.
+    Callers hydrate only the posts of the page they render.
+    """
+    now = now or timezone.now()
+    key = _key(user.pk)
+    try:
+        redis = get_redis()
+        if not redis.exists(key):
+            rebuild(user, now)
+        post_ids = [
+            post_id for post_id in redis.zrevrange(key, 0, settings.PULSE_TIMELINE_LENGTH - 1)
+            if post_id != EMPTY_MARKER
+        ]
+        redis.expire(key, settings.PULSE_TIMELINE_TTL)
+        pulled_author_ids = redis.smembers(PULLED_AUTHORS_KEY)
+    except RedisError:
+        logger.warning('Timeline unavailable for %s, querying the database', user.pk, exc_info=True)
+        return _following_keys(user, now)
+
+    timeline_keys = sorted(Post.objects.filter(
+        id__in=post_ids,
+        expires_at__gt=now
+    ).values_list('created_at', 'id'), reverse=True)
+
+    live_ids = {str(post_id) for _, post_id in timeline_keys}
+    dead = [post_id for post_id in post_ids if post_id not in live_ids]
+    if dead:
+        try:
+            redis.zrem(key, *dead)
+        except RedisError:
+            pass
+
+    if not pulled_author_ids:
+        return timeline_keys
+
+    started = time.perf_counter()
+    pulled = _pulled_keys(user, pulled_author_ids, now)
+    if not pulled:
+        return timeline_keys
+    merged = list(islice(feeds.merge(timeline_keys, pulled), settings.PULSE_TIMELINE_LENGTH))
+    metrics.incr('timeline_pull_merges')
+    metrics.incr('timeline_pulled_posts', len(pulled))
+    metrics.incr('timeline_pull_merge_ms', round((time.perf_counter() - started) * 1000))
+    return merged
+
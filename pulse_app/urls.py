@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    UserViewSet, PostViewSet, FollowViewSet, ChatViewSet, NotificationViewSet
+    UserViewSet, PostViewSet, FollowViewSet, ChatViewSet, NotificationViewSet,
+    MetricsView
 )
 
 router = DefaultRouter()
@@ -13,5 +14,6 @@ router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('auth/', include('rest_framework.urls')),
 ]
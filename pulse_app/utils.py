@@ -1,5 +1,6 @@
 """Utility functions for Pulse app"""
 import re
+from . import notifications
 from .models import User, Mention, Hashtag, PostHashtag, Notification
 
 
@@ -123,7 +124,7 @@ def create_notification(user, notification_type, actor=None, post=None, comment=
         should_notify = setting_map.get(notification_type, True)
     
     if should_notify:
-        return Notification.objects.create(
+        return notifications.notify(
             user=user,
             notification_type=notification_type,
             actor=actor,
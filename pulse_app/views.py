@@ -1,19 +1,25 @@
+import uuid
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import timedelta
+from . import chats, counters, fast_serializers, metrics, notifications, timelines
 from .models import (
-    User, Post, Like, Follow, Chat, Notification, Repost
+    User, Post, Like, Comment, Follow, Chat, Notification, Repost
 )
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, UserLoginSerializer,
     PostSerializer, PostCreateSerializer, CommentSerializer, FollowSerializer, MessageSerializer, ChatSerializer,
-    NotificationSerializer
+    NotificationSerializer, CommentCursorPagination, NotificationCursorPagination, PostCursorPagination, PREVIEW_SIZE
 )
 
+
 class UserViewSet(viewsets.ModelViewSet):
     """ViewSet for User management"""
     queryset = User.objects.all()
@@ -64,13 +70,19 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+# Posts por consulta al endpoint de contadores en lote
+COUNTERS_MAX_IDS = 50
+
+
 class PostViewSet(viewsets.ModelViewSet):
     """ViewSet for Post management"""
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Cursor (created_at, id): sin COUNT(*) por página ni OFFSET creciente
+    pagination_class = PostCursorPagination
 
-    def get_queryset(self):
+    def _visible_posts(self):
         """
         Filtra posts expirados.
         - Los posts expirados solo son visibles para su autor
@@ -90,13 +102,47 @@ class PostViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def get_queryset(self):
+        return self._visible_posts().select_related('author', 'poll').prefetch_related(
+            *self._prefetch_lookups()
+        ).with_viewer_state(self.request.user)
+
+    def _prefetch_lookups(self):
+        """Related data for a page of posts in a fixed number of queries (previews only when expanded)"""
+        expand = self.request.query_params.get('expand', '').split(',')
+        lookups = ['poll__options']
+        if 'likes' in expand:
+            lookups.append(Prefetch(
+                'likes',
+                queryset=Like.objects.select_related('user').order_by('-created_at')[:PREVIEW_SIZE],
+                to_attr='likes_preview'
+            ))
+        if 'comments' in expand:
+            lookups.append(Prefetch(
+                'comments',
+                queryset=Comment.objects.select_related('user').order_by('-created_at')[:PREVIEW_SIZE],
+                to_attr='comments_preview'
+            ))
+        return lookups
+
     def get_serializer_class(self):
         if self.action == 'create':
             return PostCreateSerializer
         return PostSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not fast_serializers.enabled(request):
+            return super().list(request, *args, **kwargs)
+        # Camino rápido: diccionarios desde values(), sin instanciar modelos ni serializers
+        queryset = fast_serializers.post_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast_serializers.serialize_posts(page, request))
+        return Response(fast_serializers.serialize_posts(queryset, request))
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        timelines.fan_out_post(post)
 
     def retrieve(self, request, *args, **kwargs):
         """
@@ -113,25 +159,43 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['post'])
-    def likes(self, request):
-        """Obtener likes de múltiples posts para actualizar en tiempo real"""
-        post_ids = request.data.get('post_ids', [])
-        likes_data = {}
-        
-        for post_id in post_ids:
-            try:
-                post = Post.objects.get(id=post_id)
-                likes_data[post_id] = post.likes_count
-            except Post.DoesNotExist:
-                likes_data[post_id] = 0
-        
-        return Response(likes_data, status=status.HTTP_200_OK)
+    @action(detail=False, methods=['get'], url_path='counters')
+    def batch_counters(self, request):
+        """
+        Contadores de varios posts para actualizar las tarjetas visibles en tiempo real.
+        GET /api/posts/counters/?ids=<uuid>,<uuid>,... (máximo COUNTERS_MAX_IDS)
+        Una sola consulta id__in; los posts expirados de otros autores se omiten.
+        """
+        raw_ids = [value for value in request.query_params.get('ids', '').split(',') if value]
+        if len(raw_ids) > COUNTERS_MAX_IDS:
+            return Response({'detail': f'Máximo {COUNTERS_MAX_IDS} posts por consulta'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            post_ids = {uuid.UUID(value) for value in raw_ids}
+        except ValueError:
+            return Response({'detail': 'ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        posts = counters.apply_pending(self._visible_posts().filter(id__in=post_ids).only(
+            'id', 'likes_count', 'comments_count', 'reposts_count', 'engagement_score',
+            'expires_at', 'is_expired', 'total_life_seconds_reached'
+        ))
+
+        return Response({
+            str(post.pk): {
+                'likes_count': post.likes_count,
+                'comments_count': post.comments_count,
+                'reposts_count': post.reposts_count,
+                'expires_at': timezone.localtime(post.expires_at) if post.expires_at else None,
+                'time_remaining_seconds': post.time_remaining_seconds,
+            }
+            for post in posts
+        }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'])
     def likes(self, request, pk=None):
         """Obtener el número de likes actual de un post"""
         post = self.get_object()
+        counters.apply_pending([post])
         
         # Si el post está expirado y el usuario no es el autor, denegar acceso
         if post.is_expired and request.user != post.author:
@@ -155,22 +219,11 @@ class PostViewSet(viewsets.ModelViewSet):
         like, created = Like.objects.get_or_create(post=post, user=request.user)
         
         if created:
-            now = timezone.now()
+            # Suma el like y extiende la vida en un único UPDATE atómico
+            counters.add_like(post)
 
-            post.likes_count += 1
-            post.total_life_seconds_reached += 60
-
-            # Si ya tiene expires_at y aún no expiró, extiende desde ahí.
-            # Si está a punto de expirar o ya pasó, empieza desde "now".
-            base = post.expires_at if post.expires_at and post.expires_at > now else now
-            post.expires_at = base + timedelta(seconds=60)
-
-            post.life_seconds_remaining = int((post.expires_at - now).total_seconds())
-            post.save()
-
-            
-            # Crear notificación
-            Notification.objects.create(
+            # Crear notificación (o sumarla al grupo reciente de likes del post)
+            notifications.notify(
                 user=post.author,
                 notification_type='like',
                 actor=request.user,
@@ -179,10 +232,18 @@ class PostViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Like agregado'}, status=status.HTTP_201_CREATED)
         else:
             like.delete()
-            post.likes_count = max(0, post.likes_count - 1)
-            post.save()
+            counters.remove_like(post)
             return Response({'detail': 'Like removido'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """Comentarios de un post, del más reciente al más antiguo, paginados por cursor"""
+        post = self.get_object()
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(post.comments.select_related('user'), request, view=self)
+        serializer = CommentSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def comment(self, request, pk=None):
         post = self.get_object()
@@ -194,8 +255,7 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(post=post, user=request.user)
-            post.comments_count += 1
-            post.save()
+            counters.add_comment(post)
             
             # Crear notificación
             Notification.objects.create(
@@ -214,48 +274,37 @@ class PostViewSet(viewsets.ModelViewSet):
         repost, created = Repost.objects.get_or_create(original_post=post, user=request.user)
         
         if created:
-            post.reposts_count += 1
-            post.save()
+            counters.add_repost(post)
+            timelines.fan_out_repost(repost)
             return Response({'detail': 'Post compartido'}, status=status.HTTP_201_CREATED)
         else:
             repost.delete()
-            post.reposts_count = max(0, post.reposts_count - 1)
-            post.save()
+            counters.remove_repost(post)
             return Response({'detail': 'Repost removido'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'])
     def feed(self, request):
         """Get personalized feed for logged-in user"""
-        from django.db.models import Q
-        user = request.user
-        
-        # Posts de usuarios que sigue
-        following_users = user.following.values_list('followee', flat=True)
-        
-        # Obtener posts originales de usuarios que sigue
-        posts_from_following = Post.objects.filter(
-            author_id__in=following_users, 
-            is_expired=False
-        )
-        
-        # Obtener reposts de usuarios que sigue
-        reposts_from_following = Repost.objects.filter(
-            user_id__in=following_users
-        ).select_related('original_post').values_list('original_post_id', flat=True)
-        
-        # Combinar posts originales y posts reposteados
-        posts = Post.objects.filter(
-            Q(id__in=posts_from_following) | Q(id__in=reposts_from_following),
-            is_expired=False
-        ).distinct().order_by('-created_at')
-        
-        serializer = self.get_serializer(posts, many=True)
+        # Timeline materializado: posts de usuarios que sigue, sus reposts y los propios.
+        # Solo se leen las claves; los posts se cargan en una consulta con el estado
+        # del usuario (like) anotado, sin una consulta por post
+        post_ids = [post_id for _, post_id in timelines.following_keys(request.user)]
+        posts = Post.objects.filter(id__in=post_ids).with_viewer_state(request.user)
+        if fast_serializers.enabled(request):
+            rows = {row['id']: row for row in fast_serializers.post_values(posts)}
+            rows = [rows[post_id] for post_id in post_ids if post_id in rows]
+            return Response(fast_serializers.serialize_posts(rows, request))
+        by_id = posts.select_related('author', 'poll').prefetch_related(*self._prefetch_lookups()).in_bulk()
+        serializer = self.get_serializer([by_id[post_id] for post_id in post_ids if post_id in by_id], many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def trending(self, request):
         """Get trending posts"""
-        posts = Post.objects.filter(is_expired=False).order_by('-likes_count')[:20]
+        posts = self.get_queryset().filter(is_expired=False).order_by('-likes_count')
+        if fast_serializers.enabled(request):
+            return Response(fast_serializers.serialize_posts(fast_serializers.post_values(posts)[:20], request))
+        posts = posts[:20]
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
 
@@ -282,8 +331,9 @@ class FollowViewSet(viewsets.ModelViewSet):
         )
         
         if created:
+            timelines.invalidate(request.user.pk)
             if not followee.is_private:
-                Notification.objects.create(
+                notifications.notify(
                     user=followee,
                     notification_type='follow',
                     actor=request.user
@@ -296,6 +346,7 @@ class FollowViewSet(viewsets.ModelViewSet):
         followee_id = request.data.get('followee_id')
         follow = get_object_or_404(Follow, follower=request.user, followee_id=followee_id)
         follow.delete()
+        timelines.invalidate(request.user.pk)
         return Response({'detail': 'Has dejado de seguir'}, status=status.HTTP_200_OK)
 
 
@@ -306,12 +357,29 @@ class ChatViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Chat.objects.filter(participants=self.request.user)
+        # Último mensaje por FK desnormalizada y no leídos anotados: consultas constantes por página
+        return Chat.objects.filter(
+            participants=self.request.user
+        ).select_related(
+            'last_message__sender'
+        ).prefetch_related('participants').with_unread_count(self.request.user)
 
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
+        """
+        Mensajes del chat, del más reciente al más antiguo.
+        Con ?after=<seq> solo los posteriores a ese número de secuencia, en orden
+        ascendente, para reanudar tras una reconexión.
+        """
         chat = self.get_object()
-        messages = chat.messages.all().order_by('-created_at')
+        after = request.query_params.get('after')
+        if after is not None:
+            if not after.isdigit():
+                return Response({'detail': 'after debe ser un número de secuencia'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            messages = chat.messages.filter(seq__gt=int(after)).select_related('sender').order_by('seq')[:chats.RESUME_LIMIT]
+        else:
+            messages = chat.messages.select_related('sender').order_by('-seq')
         serializer = MessageSerializer(messages, many=True)
         return Response(serializer.data)
 
@@ -320,10 +388,12 @@ class ChatViewSet(viewsets.ModelViewSet):
         chat = self.get_object()
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(chat=chat, sender=request.user)
-            
-            # Mark all messages as read for the sender
-            chat.messages.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
+            # Guarda, marca el chat como leído para el remitente y lo envía por WebSocket
+            message = chats.send_message(
+                chat.pk, request.user, serializer.validated_data['content'],
+                serializer.validated_data.get('content_type', 'text')
+            )
+            serializer = MessageSerializer(message)
             
             # Crear notificación
             for participant in chat.participants.exclude(id=request.user.id):
@@ -342,18 +412,46 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for Notifications"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        # Actor y post en el mismo JOIN: el número de consultas no depende de la página
+        return Notification.objects.filter(user=self.request.user).select_related('actor', 'post')
+
+    def list(self, request, *args, **kwargs):
+        if not fast_serializers.enabled(request):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(fast_serializers.notification_values(self.get_queryset()))
+        return self.get_paginated_response(fast_serializers.serialize_notifications(page, request))
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and not fast_serializers.enabled(self.request):
+            # Contadores pendientes de volcar (write-behind) en una sola ronda a Redis
+            counters.apply_pending({n.post_id: n.post for n in page if n.post_id}.values())
+        return page
 
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        # Solo descuenta del contador si no estaba leída
+        updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        notifications.marked_read(request.user.pk, updated)
         return Response({'detail': 'Notificación marcada como leída'})
 
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        notifications.reset_unread(request.user.pk)
         return Response({'detail': 'Todas las notificaciones marcadas como leídas'})
+
+
+class MetricsView(APIView):
+    """Operational metrics (timeline fan-out and pull/merge cost) for staff"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'fanout_follower_threshold': settings.PULSE_FANOUT_FOLLOWER_THRESHOLD,
+            'metrics': metrics.snapshot(),
+        })
@@ -1,16 +1,17 @@
 from django.urls import path
 from .web_views import (
-    index, register_view, login_view, logout_view, create_post_view,
+    index, feed_page, register_view, login_view, logout_view, create_post_view,
     post_detail_view, like_post, comment_post, repost_post, vote_poll, 
     profile_view, edit_profile_view, follow_user,
     unfollow_user, messages_view, chat_view, start_chat, search_view, trending_view,
     delete_post, toggle_pin_post, toggle_comments, post_stats_view,
-    notifications_view, mark_notification_read, mark_all_notifications_read,
+    notifications_view, mark_notification_read, mark_all_notifications_read, unread_notifications_count,
     mentions_timeline, hashtag_view, notification_settings_view
 )
 
 urlpatterns = [
     path('', index, name='index'),
+    path('feed/page/', feed_page, name='feed_page'),
     path('register/', register_view, name='register'),
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
@@ -37,6 +38,7 @@ urlpatterns = [
     path('notifications/', notifications_view, name='notifications'),
     path('notifications/<uuid:notification_id>/read/', mark_notification_read, name='mark_notification_read'),
     path('notifications/mark-all-read/', mark_all_notifications_read, name='mark_all_notifications_read'),
+    path('notifications/unread-count/', unread_notifications_count, name='unread_notifications_count'),
     path('mentions/', mentions_timeline, name='mentions'),
     path('hashtag/<str:hashtag_name>/', hashtag_view, name='hashtag'),
 ]
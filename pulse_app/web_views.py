@@ -3,115 +3,200 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
-from .models import Post, User, Like, Comment, Follow, Chat, Message, Repost, Poll, PollOption, PollVote, PostInteraction, Mention, Hashtag, Notification
+from django.template.loader import render_to_string
+from .models import Post, User, Like, Comment, Follow, Chat, ChatParticipant, Repost, Poll, PollOption, PollVote, PostInteraction, Mention, Hashtag, Notification
 from django.core.paginator import Paginator
-from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Q, Count, Exists, OuterRef
+from django.db.models import Q, Prefetch
 from .utils import process_mentions, process_hashtags, create_notification
+from django.conf import settings
+from . import bloom, chats, counters, feed_cache, feeds, notifications, timelines
+from .pagination import FEED_PAGE_SIZE, decode_cursor, paginate_feed, paginate_keys
 
+# Candidatos leídos por cada recomendación, para compensar los que filtra el Bloom
+RECOMMENDATION_OVERFETCH = 5
 
-def index(request):
-    """Home / Feed view with 'For You' and 'Following' tabs"""
+
+def _for_you_sources(user, now):
+    """Index-ordered sources of the 'For You' feed, merged by feeds.merge"""
+    # Obtener usuarios que sigue (solo con status accepted)
+    following_ids = list(Follow.objects.filter(
+        follower=user, 
+        status='accepted'
+    ).values_list('followee_id', flat=True))
+    
+    # 1. Posts de usuarios que sigue
+    posts_from_following = Post.objects.filter(
+        author_id__in=following_ids,
+        expires_at__gt=now
+    )
+    
+    # 2. Posts propios del usuario
+    own_posts = Post.objects.filter(
+        author=user,
+        expires_at__gt=now
+    )
+    
+    # 3. Posts recomendados (solo de cuentas públicas o que ya sigue)
+    # Recomendaciones: cuentas públicas populares con las que no ha interactuado
+    candidates = Post.objects.filter(
+        Q(author__is_private=False) | Q(author_id__in=following_ids),
+        expires_at__gt=now
+    ).exclude(
+        author=user
+    ).order_by('-engagement_score', '-created_at')  # engagement_score indexado
+    
+    # Los candidatos salen del índice por el score guardado y se ordenan por el
+    # score con decaimiento por edad y vida restante
+    rows = candidates.values_list(
+        'id', 'engagement_score', 'created_at', 'expires_at'
+    )[:20 * RECOMMENDATION_OVERFETCH]
+    candidate_ids = [row[0] for row in sorted(
+        rows,
+        key=lambda row: (counters.decayed_engagement(row[1], row[2], row[3], now), row[2]),
+        reverse=True
+    )]
+
+    # Excluir posts con los que ya ha reaccionado: filtro de Bloom sobre el
+    # lote de candidatos en vez de una subconsulta sobre todo su historial
+    recommended_ids = bloom.filter_unreacted(user.pk, candidate_ids, now)
+    if recommended_ids is None:
+        reacted_ids = set(PostInteraction.objects.filter(
+            user=user,
+            has_reacted=True,
+            post_id__in=candidate_ids
+        ).values_list('post_id', flat=True))
+        recommended_ids = [post_id for post_id in candidate_ids if post_id not in reacted_ids]
+    recommended_posts = Post.objects.filter(
+        id__in=list(recommended_ids[:20]),  # Top 20 posts populares
+        expires_at__gt=now
+    )
+    
+    return [posts_from_following, own_posts, recommended_posts]
+
+
+def _feed_keys(request, feed_type, now, limit, after=None):
+    """(created_at, id) keys of a signed-in user's feed, newest first"""
+    if feed_type == 'following':
+        # Feed "Siguiendo": timeline materializado (propios, seguidos y sus reposts).
+        # Solo las claves; _feed_page carga los posts de la página
+        return timelines.following_keys(request.user, now)
+
+    # Feed "Para Ti": usuarios que sigue + propios + recomendaciones del algoritmo,
+    # combinados con un merge de fuentes ordenadas en vez de un OR de subconsultas
+    return feeds.merged_keys(_for_you_sources(request.user, now), limit, after)
+
+
+def _feed_page(request):
+    """Return the requested feed page (after ?cursor=) and the feed type.
+
+    For signed-in users the first ``settings.PULSE_FEED_CACHE_DEPTH`` keys of
+    the feed are cached for a few seconds (see feed_cache) and only the posts
+    of the page are read from the database. Pages past the cached keys are
+    read straight from the sources, one page at a time.
+    """
     now = timezone.now()
     feed_type = request.GET.get('feed', 'for_you')  # 'for_you' or 'following'
-
-    if request.user.is_authenticated:
-        # Obtener usuarios que sigue (solo con status accepted)
-        following_ids = Follow.objects.filter(
-            follower=request.user, 
-            status='accepted'
-        ).values_list('followee_id', flat=True)
-        
-        if feed_type == 'following':
-            # Feed "Siguiendo": solo posts de usuarios que sigue + propios
-            posts = Post.objects.filter(
-                Q(author_id__in=following_ids) | Q(author=request.user),
-                expires_at__gt=now
-            ).distinct().order_by('-created_at')
-            
-        else:  # for_you
-            # Feed "Para Ti": usuarios que sigue + propios + recomendaciones del algoritmo
-            
-            # 1. Posts de usuarios que sigue
-            posts_from_following = Post.objects.filter(
-                author_id__in=following_ids,
-                expires_at__gt=now
-            )
-            
-            # 2. Posts propios del usuario
-            own_posts = Post.objects.filter(
-                author=request.user,
-                expires_at__gt=now
-            )
-            
-            # 3. Posts recomendados (solo de cuentas públicas o que ya sigue)
-            # Excluir posts con los que ya ha reaccionado
-            reacted_post_ids = PostInteraction.objects.filter(
-                user=request.user,
-                has_reacted=True
-            ).values_list('post_id', flat=True)
-            
-            # Recomendaciones: cuentas públicas populares con las que no ha interactuado
-            recommended_posts = Post.objects.filter(
-                Q(author__is_private=False) | Q(author_id__in=following_ids),
-                expires_at__gt=now
-            ).exclude(
-                id__in=reacted_post_ids
-            ).exclude(
-                author=request.user
-            ).annotate(
-                engagement_score=Count('likes') + Count('comments') + Count('reposts')
-            ).order_by('-engagement_score', '-created_at')[:20]  # Top 20 posts populares
-            
-            # Combinar posts de seguidos, propios y recomendados
-            posts = Post.objects.filter(
-                Q(id__in=posts_from_following) | Q(id__in=own_posts) | Q(id__in=recommended_posts),
-                expires_at__gt=now
-            ).distinct().order_by('-created_at')
-            
-    else:
+    if feed_type not in feed_cache.FEED_TYPES:
+        # Cualquier otro valor se sirve (y se cachea) como "Para Ti"
+        feed_type = 'for_you'
+    cursor = request.GET.get('cursor')
+
+    # Paginación por cursor (created_at, id): solo se leen y decoran page_size + 1 filas.
+    # Estado del usuario (like, repost, voto, seguimiento) en consultas constantes por página
+    # (el tiempo restante se deriva de expires_at)
+    if not request.user.is_authenticated:
         # Posts públicos de usuarios públicos (no expirados)
         posts = Post.objects.filter(
             expires_at__gt=now, 
             author__is_private=False
-        ).order_by('-created_at')
+        )
+        page = paginate_feed(posts.select_related('author').with_viewer_state(request.user), cursor)
+        return page, feed_type
+
+    depth = settings.PULSE_FEED_CACHE_DEPTH
+    keys = feed_cache.get(request.user.pk, feed_type)
+    if keys is None:
+        keys = _feed_keys(request, feed_type, now, depth)
+        feed_cache.store(request.user.pk, feed_type, keys)
+
+    page = paginate_keys(keys, cursor)
+    if feed_type != 'following' and not page.has_next and len(keys) >= depth:
+        # El feed continúa más allá de las claves cacheadas
+        keys = _feed_keys(request, feed_type, now, FEED_PAGE_SIZE + 1, after=decode_cursor(cursor))
+        page = paginate_keys(keys)
+
+    # Los datos mutables (likes, vida restante) se leen siempre frescos
+    page_ids = [post_id for _, post_id in page.items]
+    by_id = Post.objects.filter(
+        id__in=page_ids,
+        expires_at__gt=now
+    ).select_related('author').with_viewer_state(request.user).in_bulk()
+    page.items = counters.apply_pending([by_id[post_id] for post_id in page_ids if post_id in by_id])
+    return page, feed_type
 
-    # Calcular tiempo restante y agregar información de likes/reposts
-    for p in posts:
-        if not p.expires_at:
-            p.time_remaining_seconds = 0
-        else:
-            p.time_remaining_seconds = max(0, int((p.expires_at - now).total_seconds()))
-        
-        # Agregar información de si el usuario actual dio like o reposteó
-        if request.user.is_authenticated:
-            p.is_liked = Like.objects.filter(post=p, user=request.user).exists()
-            p.is_reposted = Repost.objects.filter(original_post=p, user=request.user).exists()
-        else:
-            p.is_liked = False
-            p.is_reposted = False
-        
-        # Si es una encuesta, el porcentaje se calcula automáticamente desde la propiedad
-        # del modelo PollOption, no necesita asignación manual
-    
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+
+def index(request):
+    """Home / Feed view with 'For You' and 'Following' tabs"""
+    page, feed_type = _feed_page(request)
     
     # Pasar timestamp actual en milisegundos para el JS
     import time
     now_timestamp = int(time.time() * 1000)
     
     context = {
-        'page_obj': page_obj,
-        'posts': page_obj.object_list,
+        'page': page,
+        'posts': page.items,
+        'next_cursor': page.next_cursor,
         'now_timestamp': now_timestamp,
         'feed_type': feed_type,
     }
     return render(request, 'pulse_app/index.html', context)
 
 
+def feed_page(request):
+    """Next feed page for infinite scroll, without the page chrome.
+
+    Returns the rendered post cards and the next cursor, or with
+    ?format=json the posts themselves as compact dicts.
+    """
+    page, feed_type = _feed_page(request)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'posts': [{
+                'id': str(p.id),
+                'author': p.author.username,
+                'author_photo': p.author.profile_photo.url if p.author.profile_photo else None,
+                'post_type': p.post_type,
+                'text_content': p.text_content,
+                'content_url': p.content_url.url if p.content_url else None,
+                'created_at': p.created_at.isoformat(),
+                'time_remaining_seconds': p.time_remaining_seconds,
+                'likes_count': p.likes_count,
+                'comments_count': p.comments_count,
+                'reposts_count': p.reposts_count,
+                'is_liked': p.is_liked,
+                'is_reposted': p.is_reposted,
+                'has_voted': p.has_voted,
+                'is_following_author': p.is_following_author,
+            } for p in page.items],
+            'next_cursor': page.next_cursor,
+        })
+
+    import time
+    html = render_to_string('pulse_app/partials/feed_page.html', {
+        'posts': page.items,
+        'now_timestamp': int(time.time() * 1000),
+    }, request=request)
+
+    return JsonResponse({
+        'html': html,
+        'count': len(page.items),
+        'next_cursor': page.next_cursor,
+    })
+
+
 def register_view(request):
     """User registration view"""
     if request.method == 'POST':
@@ -193,6 +278,9 @@ def create_post_view(request):
                 if option_text.strip():  # Solo crear si no está vacío
                     PollOption.objects.create(poll=poll, text=option_text)
         
+        # Publicar en los timelines de los seguidores
+        timelines.fan_out_post(post)
+        
         return redirect('post_detail', post_id=post.id)
     
     return render(request, 'pulse_app/create_post.html')
@@ -201,6 +289,7 @@ def create_post_view(request):
 def post_detail_view(request, post_id):
     """Post detail view"""
     post = get_object_or_404(Post, id=post_id)
+    counters.apply_pending([post])
     
     # Si el post está expirado, solo el autor puede verlo
     now = timezone.now()
@@ -222,18 +311,6 @@ def post_detail_view(request, post_id):
     import time
     now_timestamp = int(time.time() * 1000)
     
-    # Calcular time_remaining_seconds en la vista para los templates
-    from datetime import timedelta
-    if post.is_expired:
-        post.time_remaining_seconds = 0
-    else:
-        if post.is_expired or not post.expires_at:
-            post.time_remaining_seconds = 0
-        else:
-            remaining = (post.expires_at - timezone.now()).total_seconds()
-            post.time_remaining_seconds = max(0, int(remaining))
-
-    
     context = {
         'post': post,
         'comments': comments,
@@ -258,16 +335,8 @@ def like_post(request, post_id):
     like, created = Like.objects.get_or_create(post=post, user=request.user)
     
     if created:
-        now = timezone.now()
-
-        post.likes_count += 1
-        post.total_life_seconds_reached += 60
-
-        base = post.expires_at if post.expires_at and post.expires_at > now else now
-        post.expires_at = base + timedelta(seconds=60)
-
-        post.life_seconds_remaining = int((post.expires_at - now).total_seconds())
-        post.save()
+        # Suma el like y extiende la vida en un único UPDATE atómico
+        counters.add_like(post)
 
         # Marcar interacción para el algoritmo
         PostInteraction.objects.update_or_create(
@@ -275,12 +344,12 @@ def like_post(request, post_id):
             post=post,
             defaults={'has_reacted': True}
         )
+        bloom.add_reacted(request.user.pk, post.pk)
 
         liked = True
     else:
         like.delete()
-        post.likes_count = max(0, post.likes_count - 1)
-        post.save()
+        counters.remove_like(post)
         liked = False
     
     return JsonResponse({'liked': liked, 'likes_count': post.likes_count})
@@ -299,8 +368,7 @@ def comment_post(request, post_id):
     if request.method == 'POST':
         text = request.POST.get('text')
         comment = Comment.objects.create(post=post, user=request.user, text=text)
-        post.comments_count += 1
-        post.save()
+        counters.add_comment(post)
         
         # Procesar menciones en el comentario
         if text:
@@ -323,6 +391,7 @@ def comment_post(request, post_id):
             post=post,
             defaults={'has_reacted': True}
         )
+        bloom.add_reacted(request.user.pk, post.pk)
     
     return redirect('post_detail', post_id=post_id)
 
@@ -341,8 +410,8 @@ def repost_post(request, post_id):
     repost, created = Repost.objects.get_or_create(original_post=post, user=request.user)
     
     if created:
-        post.reposts_count += 1
-        post.save()
+        counters.add_repost(post)
+        timelines.fan_out_repost(repost)
         
         # Marcar interacción para el algoritmo
         PostInteraction.objects.update_or_create(
@@ -350,12 +419,12 @@ def repost_post(request, post_id):
             post=post,
             defaults={'has_reacted': True}
         )
+        bloom.add_reacted(request.user.pk, post.pk)
         
         reposted = True
     else:
         repost.delete()
-        post.reposts_count = max(0, post.reposts_count - 1)
-        post.save()
+        counters.remove_repost(post)
         reposted = False
     
     return JsonResponse({'reposted': reposted, 'reposts_count': post.reposts_count})
@@ -437,11 +506,12 @@ def profile_view(request, username):
             # Otros usuarios ven solo posts no expirados
             posts = user.posts.filter(expires_at__gt=now).order_by('-created_at')
     
+    posts = posts.with_viewer_state(request.user)
+
     # Obtener post fijado si existe
-    pinned_post = user.posts.filter(is_pinned=True, expires_at__gt=now).first()
-    
-    followers = user.followers.filter(status='accepted')
-    following = user.following.filter(status='accepted')
+    pinned_post = user.posts.filter(
+        is_pinned=True, expires_at__gt=now
+    ).with_viewer_state(request.user).first()
     
     is_following = False
     if request.user.is_authenticated:
@@ -455,8 +525,8 @@ def profile_view(request, username):
         'profile_user': user,
         'posts': posts,
         'pinned_post': pinned_post,
-        'followers_count': followers.count(),
-        'following_count': following.count(),
+        'followers_count': user.followers_count,
+        'following_count': user.following_count,
         'is_following': is_following
     }
     return render(request, 'pulse_app/profile.html', context)
@@ -560,6 +630,8 @@ def follow_user(request, user_id):
         followee=user,
         defaults={'status': 'accepted' if not user.is_private else 'pending'}
     )
+    if created:
+        timelines.invalidate(request.user.pk)
     
     return redirect('profile', username=user.username)
 
@@ -570,6 +642,7 @@ def unfollow_user(request, user_id):
     user = get_object_or_404(User, id=user_id)
     follow = get_object_or_404(Follow, follower=request.user, followee=user)
     follow.delete()
+    timelines.invalidate(request.user.pk)
     
     return redirect('profile', username=user.username)
 
@@ -579,15 +652,21 @@ def messages_view(request):
     """Direct messages view"""
     search_query = request.GET.get('q', '')
     
-    # Obtener chats existentes ordenados por última actividad
-    chats = Chat.objects.filter(participants=request.user).order_by('-updated_at')
+    # Obtener chats existentes ordenados por última actividad, con el último
+    # mensaje (FK desnormalizada) y los no leídos en la misma consulta
+    chats = list(Chat.objects.filter(
+        participants=request.user
+    ).select_related('last_message').with_unread_count(request.user).prefetch_related(
+        Prefetch(
+            'memberships',
+            queryset=ChatParticipant.objects.exclude(user=request.user).select_related('user'),
+            to_attr='other_memberships'
+        )
+    ).order_by('-updated_at'))
     
-    # Agregar información del último mensaje y el otro participante a cada chat
+    # Agregar el otro participante a cada chat
     for chat in chats:
-        # Obtener el otro participante
-        chat.other_user = chat.participants.exclude(id=request.user.id).first()
-        # Obtener el último mensaje
-        chat.last_message = chat.messages.first()
+        chat.other_user = chat.other_memberships[0].user if chat.other_memberships else None
     
     # Búsqueda de usuarios
     search_results = []
@@ -619,12 +698,15 @@ def chat_view(request, chat_id):
     chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
     
     if request.method == 'POST':
-        content = request.POST.get('content')
-        Message.objects.create(chat=chat, sender=request.user, content=content)
-        chat.updated_at = timezone.now()
-        chat.save()
+        # Envío sin JavaScript; con WebSocket los mensajes se envían por ChatConsumer
+        content = request.POST.get('content', '').strip()
+        if content:
+            chats.send_message(chat.pk, request.user, content)
+        return redirect('chat', chat_id=chat.id)
     
-    chat_messages = chat.messages.all().order_by('-created_at')
+    chat.mark_read(request.user)
+    # Solo los últimos mensajes; los nuevos llegan por WebSocket a partir de last_seq
+    chat_messages = chats.recent_messages(chat)
     
     # Obtener el otro participante
     other_user = chat.participants.exclude(id=request.user.id).first()
@@ -633,6 +715,7 @@ def chat_view(request, chat_id):
         'chat': chat,
         'chat_messages': chat_messages,
         'other_user': other_user,
+        'last_seq': chat_messages[-1].seq if chat_messages else 0,
     }
     return render(request, 'pulse_app/chat.html', context)
 
@@ -680,15 +763,9 @@ def trending_view(request):
     """Trending posts view"""
     now = timezone.now()
 
-    posts = Post.objects.filter(expires_at__gt=now).order_by('-likes_count')[:50]
-
-    for post in posts:
-        if not post.expires_at:
-            post.time_remaining_seconds = 0
-        else:
-            post.time_remaining_seconds = max(
-                0, int((post.expires_at - now).total_seconds())
-            )
+    posts = Post.objects.filter(
+        expires_at__gt=now
+    ).select_related('author').with_viewer_state(request.user).order_by('-likes_count')[:50]
 
     # Timestamp actual en milisegundos para JS
     import time
@@ -710,6 +787,7 @@ def delete_post(request, post_id):
     if post.author != request.user:
         return JsonResponse({'error': 'No autorizado'}, status=403)
     
+    feed_cache.invalidate([post.author_id])
     post.delete()
     return JsonResponse({'success': True})
 
@@ -728,7 +806,7 @@ def toggle_pin_post(request, post_id):
         Post.objects.filter(author=request.user, is_pinned=True).update(is_pinned=False)
     
     post.is_pinned = not post.is_pinned
-    post.save()
+    post.save(update_fields=['is_pinned', 'updated_at'])
     
     return JsonResponse({'success': True, 'is_pinned': post.is_pinned})
 
@@ -743,7 +821,7 @@ def toggle_comments(request, post_id):
         return JsonResponse({'error': 'No autorizado'}, status=403)
     
     post.comments_disabled = not post.comments_disabled
-    post.save()
+    post.save(update_fields=['comments_disabled', 'updated_at'])
     
     return JsonResponse({'success': True, 'comments_disabled': post.comments_disabled})
 
@@ -768,19 +846,12 @@ def post_stats_view(request, post_id):
     time_alive = now - post.created_at
     time_alive_str = str(time_alive).split('.')[0]  # Formato HH:MM:SS
     
-    # Si aún no ha expirado, calcular tiempo restante
-    if not post.is_expired and post.expires_at:
-        time_remaining = post.expires_at - now
-        time_remaining_seconds = max(0, int(time_remaining.total_seconds()))
-    else:
-        time_remaining_seconds = 0
-    
     context = {
         'post': post,
         'likes': likes,
         'reposts': reposts,
         'time_alive': time_alive_str,
-        'time_remaining_seconds': time_remaining_seconds,
+        'time_remaining_seconds': post.time_remaining_seconds,
     }
     
     return render(request, 'pulse_app/post_stats.html', context)
@@ -792,27 +863,27 @@ def notifications_view(request):
     filter_type = request.GET.get('filter', 'all')
     
     # Base queryset
-    notifications = Notification.objects.filter(user=request.user).select_related(
+    notification_list = Notification.objects.filter(user=request.user).select_related(
         'actor', 'post', 'comment'
     )
     
     # Apply filters
     if filter_type == 'mentions':
-        notifications = notifications.filter(notification_type='mention')
+        notification_list = notification_list.filter(notification_type='mention')
     elif filter_type == 'likes':
-        notifications = notifications.filter(notification_type='like')
+        notification_list = notification_list.filter(notification_type='like')
     elif filter_type == 'follows':
-        notifications = notifications.filter(notification_type__in=['follow', 'follow_request'])
+        notification_list = notification_list.filter(notification_type__in=['follow', 'follow_request'])
     elif filter_type == 'unread':
-        notifications = notifications.filter(is_read=False)
+        notification_list = notification_list.filter(is_read=False)
     
     # Paginate
-    paginator = Paginator(notifications, 20)
+    paginator = Paginator(notification_list, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Count unread
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+    # Contador de no leídas en caché (ver notifications.unread_count)
+    unread_count = notifications.unread_count(request.user.pk)
     
     context = {
         'page_obj': page_obj,
@@ -829,8 +900,9 @@ def notifications_view(request):
 def mark_notification_read(request, notification_id):
     """Mark a single notification as read"""
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
+    # Solo descuenta del contador si no estaba leída
+    updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+    notifications.marked_read(request.user.pk, updated)
     return JsonResponse({'success': True})
 
 
@@ -839,9 +911,16 @@ def mark_notification_read(request, notification_id):
 def mark_all_notifications_read(request):
     """Mark all notifications as read"""
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    notifications.reset_unread(request.user.pk)
     return JsonResponse({'success': True})
 
 
+@login_required
+def unread_notifications_count(request):
+    """Contador de notificaciones no leídas para clientes sin WebSocket (polling)"""
+    return JsonResponse({'unread_count': notifications.unread_count(request.user.pk)})
+
+
 @login_required
 def mentions_timeline(request):
     """Timeline of user mentions"""
@@ -870,18 +949,7 @@ def hashtag_view(request, hashtag_name):
     posts = Post.objects.filter(
         hashtags__hashtag=hashtag,
         expires_at__gt=now
-    ).distinct().order_by('-created_at')
-    
-    # Calculate time remaining for each post
-    for p in posts:
-        if not p.expires_at:
-            p.time_remaining_seconds = 0
-        else:
-            p.time_remaining_seconds = max(0, int((p.expires_at - now).total_seconds()))
-        
-        if request.user.is_authenticated:
-            p.is_liked = Like.objects.filter(post=p, user=request.user).exists()
-            p.is_reposted = Repost.objects.filter(original_post=p, user=request.user).exists()
+    ).distinct().select_related('author').with_viewer_state(request.user).order_by('-created_at')
     
     paginator = Paginator(posts, 10)
     page_number = request.GET.get('page')
@@ -905,28 +973,31 @@ def notification_settings_view(request):
     """View and edit notification settings"""
     from .models import NotificationSettings
     
-    settings, created = NotificationSettings.objects.get_or_create(user=request.user)
+    notification_settings, created = NotificationSettings.objects.get_or_create(user=request.user)
+    max_threshold = settings.PULSE_MAX_EXPIRING_THRESHOLD
     
     if request.method == 'POST':
-        settings.notify_likes = request.POST.get('notify_likes') == 'on'
-        settings.notify_comments = request.POST.get('notify_comments') == 'on'
-        settings.notify_mentions = request.POST.get('notify_mentions') == 'on'
-        settings.notify_follows = request.POST.get('notify_follows') == 'on'
-        settings.notify_messages = request.POST.get('notify_messages') == 'on'
-        settings.notify_reposts = request.POST.get('notify_reposts') == 'on'
-        settings.notify_post_expiring = request.POST.get('notify_post_expiring') == 'on'
-        settings.notify_friend_reminder = request.POST.get('notify_friend_reminder') == 'on'
+        notification_settings.notify_likes = request.POST.get('notify_likes') == 'on'
+        notification_settings.notify_comments = request.POST.get('notify_comments') == 'on'
+        notification_settings.notify_mentions = request.POST.get('notify_mentions') == 'on'
+        notification_settings.notify_follows = request.POST.get('notify_follows') == 'on'
+        notification_settings.notify_messages = request.POST.get('notify_messages') == 'on'
+        notification_settings.notify_reposts = request.POST.get('notify_reposts') == 'on'
+        notification_settings.notify_post_expiring = request.POST.get('notify_post_expiring') == 'on'
+        notification_settings.notify_friend_reminder = request.POST.get('notify_friend_reminder') == 'on'
         
         expiring_threshold = request.POST.get('expiring_threshold')
         if expiring_threshold:
-            settings.expiring_threshold = int(expiring_threshold)
+            # En segundos, como lo lee expiry.warn_expiring_posts (hasta el máximo que revisa)
+            notification_settings.expiring_threshold = max(1, min(int(expiring_threshold), max_threshold))
         
-        settings.save()
+        notification_settings.save()
         
         return redirect('notification_settings')
     
     context = {
-        'settings': settings,
+        'settings': notification_settings,
+        'max_expiring_threshold': max_threshold,
     }
     
     return render(request, 'pulse_app/notification_settings.html', context)
@@ -5,6 +5,8 @@ Django settings for Pulse backend.
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -57,6 +59,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pulse_app.context_processors.unread_notifications',
             ],
         },
     },
@@ -155,6 +158,16 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Camino rápido de la API: listas de posts y notificaciones serializadas desde
+# values() y respuestas JSON generadas con orjson
+PULSE_FAST_API = os.environ.get('PULSE_FAST_API', 'False') == 'True'
+
+if PULSE_FAST_API:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'pulse_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -172,20 +185,148 @@ CELERY_TIMEZONE = 'America/Mexico_City'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 
+# Redis para colas y contadores de la app. Lo comparten el servidor web, el worker
+# y el beat de Celery, así que por defecto es el mismo del broker. 'memory://' usa
+# un almacén en memoria de cada proceso: solo para tests y desarrollo con DEBUG
+PULSE_REDIS_URL = os.environ.get('REDIS_URL', CELERY_BROKER_URL)
+PULSE_REDIS_IN_MEMORY = PULSE_REDIS_URL == 'memory://'
+
+if PULSE_REDIS_IN_MEMORY and not DEBUG:
+    raise ImproperlyConfigured(
+        "REDIS_URL=memory:// solo se permite con DEBUG: cada proceso tendría su propio "
+        "almacén y el worker de Celery no vería las colas del servidor web"
+    )
+
+# Expiración de posts: número de posts que se expiran por lote
+PULSE_EXPIRY_CHUNK_SIZE = int(os.environ.get('PULSE_EXPIRY_CHUNK_SIZE', 500))
+
+# Timelines materializados del feed "Siguiendo": posts por timeline y segundos
+# de inactividad tras los que se descartan (se reconstruyen al volver a leerse)
+PULSE_TIMELINE_LENGTH = int(os.environ.get('PULSE_TIMELINE_LENGTH', 500))
+PULSE_TIMELINE_TTL = int(os.environ.get('PULSE_TIMELINE_TTL', 24 * 60 * 60))
+# A partir de este número de seguidores los posts no se reparten al publicar,
+# se leen y mezclan al consultar el timeline
+PULSE_FANOUT_FOLLOWER_THRESHOLD = int(os.environ.get('PULSE_FANOUT_FOLLOWER_THRESHOLD', 10000))
+
+# Caché de los ids de cada feed por usuario (segundos). Se invalida al seguir o
+# dejar de seguir, al publicar alguien seguido y al expirar posts propios
+PULSE_FEED_CACHE_TTL = int(os.environ.get('PULSE_FEED_CACHE_TTL', 15))
+# Posts del feed "Para ti" que se guardan en caché; las páginas posteriores se leen
+# directamente de las fuentes
+PULSE_FEED_CACHE_DEPTH = int(os.environ.get('PULSE_FEED_CACHE_DEPTH', 100))
+
+# Recomendaciones "Para ti": segundos en los que el score de interacción de un
+# post pierde la mitad de su peso por antigüedad
+PULSE_ENGAGEMENT_HALF_LIFE = int(os.environ.get('PULSE_ENGAGEMENT_HALF_LIFE', 30 * 60))
+
+# Filtro de Bloom por usuario de posts con los que ya reaccionó (recomendaciones
+# "Para ti"): bits y funciones hash del filtro y segundos de cada generación
+PULSE_REACTED_FILTER_BITS = int(os.environ.get('PULSE_REACTED_FILTER_BITS', 8192))
+PULSE_REACTED_FILTER_HASHES = int(os.environ.get('PULSE_REACTED_FILTER_HASHES', 4))
+PULSE_REACTED_FILTER_GENERATION = int(os.environ.get('PULSE_REACTED_FILTER_GENERATION', 60 * 60))
+
+# Caché de Django: Redis compartido, o memoria local del proceso con 'memory://'
+if not PULSE_REDIS_IN_MEMORY:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': PULSE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Capa de canales para WebSockets: Redis compartido, o memoria del proceso con 'memory://'
+if not PULSE_REDIS_IN_MEMORY:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [PULSE_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Actualizaciones en vivo de posts: segundos entre envíos (los cambios de un post
+# dentro de un intervalo se agrupan en un solo mensaje) y posts por envío
+PULSE_LIVE_TICK = float(os.environ.get('PULSE_LIVE_TICK', 1.0))
+PULSE_LIVE_BATCH = int(os.environ.get('PULSE_LIVE_BATCH', 1000))
+
+# Segundos que se guarda en caché el contador de notificaciones no leídas de cada
+# usuario (se mantiene al crear y leer notificaciones; al caducar se recuenta).
+# Con 'memory://' la caché no es compartida con el worker de Celery, que crea los
+# avisos de expiración, así que se guarda poco tiempo
+PULSE_UNREAD_CACHE_TTL = int(os.environ.get(
+    'PULSE_UNREAD_CACHE_TTL', 30 if PULSE_REDIS_IN_MEMORY else 24 * 60 * 60
+))
+
+# Agregación de notificaciones: los likes, reposts y follows de un mismo
+# (usuario, tipo, post) dentro de la ventana (segundos desde el primer evento)
+# se acumulan en una sola fila con el número de actores y una muestra acotada
+PULSE_NOTIFICATION_AGGREGATION = os.environ.get('PULSE_NOTIFICATION_AGGREGATION', 'False') == 'True'
+PULSE_NOTIFICATION_WINDOW = int(os.environ.get('PULSE_NOTIFICATION_WINDOW', 24 * 60 * 60))
+PULSE_NOTIFICATION_ACTOR_SAMPLE = int(os.environ.get('PULSE_NOTIFICATION_ACTOR_SAMPLE', 3))
+
+# Umbral máximo (segundos) para avisar de que un post está por expirar
+PULSE_MAX_EXPIRING_THRESHOLD = int(os.environ.get('PULSE_MAX_EXPIRING_THRESHOLD', 600))
+
 # Celery Beat (tareas periódicas)
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
+    'expire-scheduled-posts': {
+        'task': 'pulse_app.tasks.expire_scheduled_posts',
+        'schedule': 1.0,  # Ejecutar cada segundo
+    },
+    'warn-expiring-posts': {
+        'task': 'pulse_app.tasks.warn_expiring_posts',
+        'schedule': 10.0,  # Ejecutar cada 10 segundos
+    },
     'check-and-expire-posts': {
         'task': 'pulse_app.tasks.check_and_expire_posts',
-        'schedule': crontab(minute='*'),  # Ejecutar cada minuto
-    },
-    'update-post-life': {
-        'task': 'pulse_app.tasks.update_post_life',
-        'schedule': 30.0,  # Ejecutar cada 30 segundos
+        'schedule': crontab(minute='*'),  # Barrido de respaldo cada minuto
     },
     'generate-trending-posts': {
         'task': 'pulse_app.tasks.generate_trending_posts',
         'schedule': 300.0,  # Ejecutar cada 5 minutos
     },
+    'broadcast-live-updates': {
+        'task': 'pulse_app.tasks.broadcast_live_updates',
+        'schedule': PULSE_LIVE_TICK,
+    },
 }
+
+# El tiempo de vida restante se deriva de expires_at al leer. Solo si se
+# desactiva se vuelve a programar la reescritura periódica de la columna.
+PULSE_DERIVED_POST_LIFE = os.environ.get('PULSE_DERIVED_POST_LIFE', 'True') == 'True'
+
+# Buffer de escritura para contadores de posts: los likes, comentarios y reposts
+# se acumulan en Redis y se vuelcan a la base de datos por lotes
+PULSE_COUNTER_WRITE_BEHIND = os.environ.get('PULSE_COUNTER_WRITE_BEHIND', 'False') == 'True'
+PULSE_COUNTER_FLUSH_BATCH = int(os.environ.get('PULSE_COUNTER_FLUSH_BATCH', 1000))
+
+if PULSE_COUNTER_WRITE_BEHIND and PULSE_REDIS_IN_MEMORY:
+    raise ImproperlyConfigured(
+        "PULSE_COUNTER_WRITE_BEHIND necesita un Redis compartido: con REDIS_URL=memory:// "
+        "el worker de Celery no vería los contadores acumulados por el servidor web"
+    )
+
+if PULSE_COUNTER_WRITE_BEHIND:
+    CELERY_BEAT_SCHEDULE['flush-post-counters'] = {
+        'task': 'pulse_app.tasks.flush_post_counters',
+        'schedule': 2.0,  # Ejecutar cada 2 segundos
+    }
+
+if not PULSE_DERIVED_POST_LIFE:
+    CELERY_BEAT_SCHEDULE['update-post-life'] = {
+        'task': 'pulse_app.tasks.update_post_life',
+        'schedule': 30.0,  # Ejecutar cada 30 segundos
+    }
@@ -5,8 +5,10 @@ class InfiniteScroll {
         this.threshold = options.threshold || 300; // pixels from bottom
         this.onLoadMore = options.onLoadMore;
         this.loading = false;
-        this.hasMore = true;
-        this.currentPage = options.initialPage || 1;
+        // Cursor opaco de la siguiente página, lo expone el servidor en data-next-cursor
+        this.nextCursor = options.nextCursor || (this.container && this.container.dataset.nextCursor) || '';
+        this.hasMore = Boolean(this.nextCursor);
+        this.pageUrl = options.pageUrl || (this.container && this.container.dataset.pageUrl) || '/feed/page/';
         
         this.init();
     }
@@ -51,13 +53,15 @@ class InfiniteScroll {
         this.loadingIndicator.style.display = 'flex';
         
         try {
-            this.currentPage++;
             const urlParams = new URLSearchParams(window.location.search);
             const feedType = urlParams.get('feed') || 'for_you';
+            const cursor = encodeURIComponent(this.nextCursor);
             
-            const response = await fetch(`?feed=${feedType}&page=${this.currentPage}`, {
+            // El endpoint devuelve solo las tarjetas de la página y el siguiente cursor
+            const response = await fetch(`${this.pageUrl}?feed=${feedType}&cursor=${cursor}`, {
                 headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
+                    'X-Requested-With': 'XMLHttpRequest',
+                    'Accept': 'application/json'
                 }
             });
             
@@ -65,10 +69,11 @@ class InfiniteScroll {
                 throw new Error('Error al cargar posts');
             }
             
-            const html = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(html, 'text/html');
-            const newPosts = doc.querySelectorAll('.post-card');
+            const data = await response.json();
+            const template = document.createElement('template');
+            template.innerHTML = data.html;
+            const newPosts = template.content.querySelectorAll('.post-card');
+            this.nextCursor = data.next_cursor || '';
             
             if (newPosts.length === 0) {
                 this.hasMore = false;
@@ -81,7 +86,7 @@ class InfiniteScroll {
             
             // Append new posts
             newPosts.forEach(post => {
-                this.container.appendChild(post.cloneNode(true));
+                this.container.appendChild(post);
             });
             
             // Reinitialize timers for new posts
@@ -93,6 +98,10 @@ class InfiniteScroll {
                 this.onLoadMore(newPosts.length);
             }
             
+            if (!this.nextCursor) {
+                this.hasMore = false;
+            }
+            
         } catch (error) {
             console.error('Error loading more posts:', error);
             this.loadingIndicator.innerHTML = '<span>Error al cargar posts</span>';
@@ -116,12 +125,8 @@ class InfiniteScroll {
 
 // Inicializar solo en móvil
 if (window.innerWidth <= 768 && document.querySelector('.posts-list')) {
-    const urlParams = new URLSearchParams(window.location.search);
-    const currentPage = parseInt(urlParams.get('page')) || 1;
-    
     new InfiniteScroll({
         container: document.querySelector('.posts-list'),
-        initialPage: currentPage,
         onLoadMore: (count) => {
             console.log(`Loaded ${count} more posts`);
         }
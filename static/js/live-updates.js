@@ -0,0 +1,108 @@
+// Actualizaciones en vivo de los posts visibles por WebSocket (likes, vida y expiración).
+// rainbow-hearts.js deja de hacer polling cuando llega el primer push de la conexión
+// (con el socket abierto pero sin pushes, p. ej. sin capa de canales compartida con
+// el worker de Celery, los contadores se siguen consultando).
+
+class LiveUpdates {
+    constructor() {
+        this.socket = null;
+        this.connected = false;
+        this.receiving = false;
+        this.visible = new Set();
+        this.retryDelay = 1000;
+
+        this.observer = new IntersectionObserver(this.handleIntersection.bind(this));
+        this.observeCards(document);
+
+        // Tarjetas añadidas por el scroll infinito o el pull-to-refresh
+        new MutationObserver(mutations => {
+            mutations.forEach(mutation => {
+                mutation.addedNodes.forEach(node => {
+                    if (node.nodeType === Node.ELEMENT_NODE) this.observeCards(node);
+                });
+            });
+        }).observe(document.body, { childList: true, subtree: true });
+
+        this.connect();
+    }
+
+    observeCards(root) {
+        const selector = '.post-card[data-post-id], .post-detail[data-post-id]';
+        if (root.matches && root.matches(selector)) this.observer.observe(root);
+        root.querySelectorAll(selector).forEach(card => this.observer.observe(card));
+    }
+
+    connect() {
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        this.socket = new WebSocket(`${scheme}://${window.location.host}/ws/posts/`);
+
+        this.socket.addEventListener('open', () => {
+            this.connected = true;
+            this.retryDelay = 1000;
+            this.send('subscribe', Array.from(this.visible));
+        });
+
+        this.socket.addEventListener('message', event => {
+            const data = JSON.parse(event.data);
+            this.receiving = true;
+            if (data.type === 'post.update') {
+                this.applyUpdate(data.post);
+            } else if (data.type === 'post.removed') {
+                this.cards(data.post_id).forEach(card => card.classList.add('post-removed'));
+            }
+        });
+
+        this.socket.addEventListener('close', () => {
+            this.connected = false;
+            this.receiving = false;
+            // Reintentar con espera exponencial (máximo 30 segundos)
+            setTimeout(() => this.connect(), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, 30000);
+        });
+    }
+
+    send(action, postIds) {
+        if (!this.connected || postIds.length === 0) return;
+        this.socket.send(JSON.stringify({ action: action, post_ids: postIds }));
+    }
+
+    handleIntersection(entries) {
+        const subscribe = [];
+        const unsubscribe = [];
+        entries.forEach(entry => {
+            const postId = entry.target.getAttribute('data-post-id');
+            if (entry.isIntersecting && !this.visible.has(postId)) {
+                this.visible.add(postId);
+                subscribe.push(postId);
+            } else if (!entry.isIntersecting && this.visible.has(postId)) {
+                this.visible.delete(postId);
+                unsubscribe.push(postId);
+            }
+        });
+        this.send('subscribe', subscribe);
+        this.send('unsubscribe', unsubscribe);
+    }
+
+    cards(postId) {
+        return document.querySelectorAll(`.post-card[data-post-id="${postId}"], .post-detail[data-post-id="${postId}"]`);
+    }
+
+    applyUpdate(post) {
+        this.cards(post.id).forEach(card => {
+            updateCardLikes(card, post.likes_count);
+
+            // Reiniciar el temporizador de vida con el valor del servidor (main.js)
+            card.querySelectorAll('[data-time-remaining]').forEach(timer => {
+                timer.setAttribute('data-time-remaining', post.is_expired ? 0 : post.time_remaining_seconds);
+                timer.setAttribute('data-loaded-at', Date.now());
+            });
+        });
+        updatePostTimers();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!('WebSocket' in window) || !('IntersectionObserver' in window)) return;
+    if (!document.querySelector('[data-post-id]')) return;
+    window.pulseLive = new LiveUpdates();
+});
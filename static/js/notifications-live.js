@@ -0,0 +1,78 @@
+// Notificaciones en vivo: badge de no leídas y aviso de nuevas notificaciones.
+// Usa el WebSocket /ws/notifications/ y, si no está disponible, consulta el
+// contador cada 30 segundos.
+
+(function() {
+    const link = document.querySelector('.nav-notifications');
+    const badge = document.getElementById('notification-badge');
+    if (!link || !badge) return;
+
+    const POLL_INTERVAL = 30000;
+    let socket = null;
+    let pollTimer = null;
+    let retryDelay = 1000;
+
+    const messages = {
+        like: 'A alguien le gustó tu publicación',
+        comment: 'Nuevo comentario en tu publicación',
+        follow: 'Tienes un nuevo seguidor',
+        follow_request: 'Nueva solicitud de seguimiento',
+        message: 'Nuevo mensaje',
+        mention: 'Te mencionaron en una publicación',
+        repost: 'Compartieron tu publicación',
+        expire: 'Tu publicación ha expirado',
+        post_expiring: 'Tu publicación está por expirar',
+    };
+
+    function setCount(count) {
+        badge.textContent = count > 99 ? '99+' : count;
+        badge.hidden = !count;
+    }
+
+    function poll() {
+        if (document.hidden) return;
+        fetch(link.dataset.unreadUrl, { credentials: 'same-origin' })
+            .then(response => response.ok ? response.json() : null)
+            .then(data => { if (data) setCount(data.unread_count); })
+            .catch(() => {});
+    }
+
+    function startPolling() {
+        if (!pollTimer) pollTimer = setInterval(poll, POLL_INTERVAL);
+    }
+
+    function stopPolling() {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+
+    function connect() {
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        socket = new WebSocket(`${scheme}://${window.location.host}/ws/notifications/`);
+
+        socket.addEventListener('open', () => {
+            retryDelay = 1000;
+            stopPolling();
+        });
+
+        socket.addEventListener('message', event => {
+            const data = JSON.parse(event.data);
+            setCount(data.unread_count);
+            if (data.type === 'notification.new' && window.toast) {
+                window.toast.info(messages[data.notification.notification_type] || 'Nueva notificación');
+            }
+        });
+
+        socket.addEventListener('close', () => {
+            startPolling();
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 60000);
+        });
+    }
+
+    if ('WebSocket' in window) {
+        connect();
+    } else {
+        startPolling();
+    }
+})();
@@ -80,20 +80,60 @@ function updateHeartColors() {
     });
 }
 
-// Polling para actualizar likes cada 2 segundos
+// Máximo de posts por petición (COUNTERS_MAX_IDS en el servidor)
+const COUNTERS_BATCH_SIZE = 50;
+
+// Tarjetas de post visibles en pantalla (incluye las añadidas por el scroll infinito)
+function getVisiblePostCards() {
+    const viewportHeight = window.innerHeight || document.documentElement.clientHeight;
+    return Array.from(document.querySelectorAll('.post-card[data-post-id], .post-detail[data-post-id]'))
+        .filter(card => {
+            const rect = card.getBoundingClientRect();
+            return rect.bottom > 0 && rect.top < viewportHeight;
+        });
+}
+
+// Actualizar los contadores de likes de una tarjeta
+function updateCardLikes(card, likesCount) {
+    const likesSpans = card.querySelectorAll('span[data-likes-count]');
+    likesSpans.forEach(span => {
+        const oldCount = parseInt(span.getAttribute('data-likes-count')) || 0;
+        
+        if (oldCount !== likesCount) {
+            span.setAttribute('data-likes-count', likesCount);
+            span.textContent = likesCount;
+            
+            // Actualizar color del corazón asociado
+            const heartIcon = span.closest('[class*="action-btn"], [class*="post-badge"], [class*="post-stats"], [class*="grid-likes"]')?.querySelector('svg');
+            if (heartIcon) {
+                heartIcon.style.color = getRainbowColor(likesCount);
+            }
+        }
+    });
+}
+
+// Polling para actualizar likes cada 2 segundos: una sola petición por intervalo
+// con todos los posts visibles, en lugar de una por tarjeta
 function startLikesPolling() {
-    // Obtener todos los post IDs en la página
-    const postCards = document.querySelectorAll('[data-post-id]');
-    
-    if (postCards.length === 0) return;
+    if (!document.querySelector('[data-post-id]')) return;
 
     setInterval(() => {
-        postCards.forEach(card => {
+        // Cuando el WebSocket de live-updates.js ya entrega pushes los contadores llegan por ahí
+        if (document.hidden || (window.pulseLive && window.pulseLive.receiving)) return;
+
+        const cardsById = new Map();
+        getVisiblePostCards().forEach(card => {
             const postId = card.getAttribute('data-post-id');
-            
             if (!postId) return;
+            if (!cardsById.has(postId)) cardsById.set(postId, []);
+            cardsById.get(postId).push(card);
+        });
+
+        const postIds = Array.from(cardsById.keys());
+        for (let i = 0; i < postIds.length; i += COUNTERS_BATCH_SIZE) {
+            const ids = postIds.slice(i, i + COUNTERS_BATCH_SIZE);
 
-            fetch(`/api/posts/${postId}/likes/`, {
+            fetch(`/api/posts/counters/?ids=${ids.join(',')}`, {
                 method: 'GET',
                 headers: {
                     'Content-Type': 'application/json',
@@ -104,27 +144,14 @@ function startLikesPolling() {
                 return response.json();
             })
             .then(data => {
-                if (data.likes_count !== undefined) {
-                    // Actualizar el contador de likes
-                    const likesSpans = card.querySelectorAll('span[data-likes-count]');
-                    likesSpans.forEach(span => {
-                        const oldCount = parseInt(span.getAttribute('data-likes-count')) || 0;
-                        
-                        if (oldCount !== data.likes_count) {
-                            span.setAttribute('data-likes-count', data.likes_count);
-                            span.textContent = data.likes_count;
-                            
-                            // Actualizar color del corazón asociado
-                            const heartIcon = span.closest('[class*="action-btn"], [class*="post-badge"], [class*="post-stats"], [class*="grid-likes"]')?.querySelector('svg');
-                            if (heartIcon) {
-                                heartIcon.style.color = getRainbowColor(data.likes_count);
-                            }
-                        }
+                Object.entries(data).forEach(([postId, postCounters]) => {
+                    (cardsById.get(postId) || []).forEach(card => {
+                        updateCardLikes(card, postCounters.likes_count);
                     });
-                }
+                });
             })
             .catch(error => console.error('Error al actualizar likes:', error));
-        });
+        }
     }, 2000); // Actualizar cada 2 segundos
 }
 